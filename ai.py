@@ -1,8 +1,9 @@
-import random
+from functools import partial
 
 from enums.directions import Dir
 from game_actions import Action, ActionError, GameActionsProperties
 from generic_algorithms import resize_vector_to_len, get_vector, add_vector
+from instrumentation import timed
 
 
 class AI(GameActionsProperties, object):
@@ -10,6 +11,15 @@ class AI(GameActionsProperties, object):
     def __init__(self):
         self.ai_state = {}
 
+    def __getstate__(self):
+        # self.actions is set on every act and would keep the last acted creature in saves
+        exclude_state = ('actions',)
+        state = vars(self).copy()
+        for item in exclude_state:
+            state.pop(item, None)
+        return state
+
+    @timed("ai.act")
     def act(self, game_actions, alert_coord):
         self.actions = game_actions
 
@@ -62,6 +72,14 @@ class AI(GameActionsProperties, object):
             "AI state bug. Got error from game: {} {}".format(feedback.type, feedback.params)
 
     def _move_towards(self, target_coord):
+        distance_map = self.level.get_distance_map(target_coord)
+        if self.coord in distance_map:
+            # Follow the gradient of the level's shared distance map
+            distance = distance_map.get
+        else:
+            # Target unreachable by walking, just head to its general direction
+            distance = partial(self.level.distance_heuristic, coordB=target_coord)
+
         best_action = Action.Move
         best_direction = Dir.Stay
         best_cost = None
@@ -74,7 +92,9 @@ class AI(GameActionsProperties, object):
             else:
                 continue
 
-            cost = self.level.distance_heuristic(coord, target_coord)
+            cost = distance(coord)
+            if cost is None:
+                continue
             if best_cost is None or cost < best_cost:
                 best_action = action
                 best_direction = direction
@@ -89,8 +109,9 @@ class AI(GameActionsProperties, object):
 
     def _move_random(self):
         valid_dirs = [direction for direction in Dir.All if self.actions.can_move(direction)]
-        if random.random() < 0.8 and len(valid_dirs) > 0:
-            return self.actions.move(random.choice(valid_dirs))
+        rng = self.level.ai_random
+        if rng.random() < 0.8 and len(valid_dirs) > 0:
+            return self.actions.move(rng.choice(valid_dirs))
         else:
             return self.actions.move(Dir.Stay)
 
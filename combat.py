@@ -1,17 +1,17 @@
-from random import randint
+import random
 
 from dice import dice_roll
 
 
-def get_melee_attack_cr(creature, target):
+def get_melee_attack_cr(creature, target, rng=random):
     return get_melee_attack(creature.accuracy, creature.get_damage_info(),
-                            target.defense, target.armor)
+                            target.defense, target.armor, rng)
 
 
-def get_melee_attack(accuracy, damage_info, defense, armor):
-    roll = randint(1, 100) + accuracy - defense
+def get_melee_attack(accuracy, damage_info, defense, armor, rng=random):
+    roll = rng.randint(1, 100) + accuracy - defense
     if roll > 25:
-        return (True, max(dice_roll(*damage_info) - armor, 0))
+        return (True, max(dice_roll(*damage_info, rng=rng) - armor, 0))
     else:
         return (False, 0)
 
@@ -9,6 +9,8 @@ class Debug(object):
     log_level = logging.DEBUG
     log_file = join(GameConf.save_folder, "pyrl.log")
     profiling_output_file = join(GameConf.save_folder, "profiling_results")
+    sampling_output_file = join(GameConf.save_folder, "profile_samples.collapsed")
+    instrumentation_output_file = join(GameConf.save_folder, "instrumentation_results")
     path = True
     path_step = False
     cross = True
@@ -4,8 +4,14 @@ class GameConf(object):
 
     """Configure variables above the data section to suit your needs."""
 
+    # one of state_store.codecs: none, zlib, bz2 or lzma
+    save_codec             = "zlib"
     # valid between 1 and 9, higher slower but less space
-    save_compression_level = 9
+    save_compression_level = 6
+    # threads compressing save chunks in parallel, None for one per cpu
+    save_compression_threads = None
+    # turns between saves written in the background, 0 disables autosaving
+    autosave_interval      = 200
 
     message_bar_height     = 2
     status_bar_height      = 2
@@ -13,6 +19,20 @@ class GameConf(object):
     default_game_name      = "pyrl"
     clearly_show_vision    = False
 
+    # one of fov.algorithms: shadowcast, symmetric_shadowcast or bresenham
+    fov_algorithm          = "shadowcast"
+
+    # seed of new worlds, None for a random one. The same seed gives the same levels
+    world_seed             = None
+
+    # finalize the levels next to the current one in a background process
+    pregenerate_levels     = True
+    pregeneration_workers  = 1
+
+    # move the creatures of the levels out of sight in coarse steps between player turns
+    offscreen_simulation   = True
+    offscreen_buckets_per_turn = 1
+
     ##################################
     ### Data section, don't modify ###
     ##################################
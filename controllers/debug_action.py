@@ -1,12 +1,13 @@
 import code
-import random
 
 from bindings import Bind
 from config.debug import Debug
 from creature import Creature
 from game_actions import GameActionsProperties, feedback, Action
+from instrumentation import instruments
 from enums.level_gen import LevelGen
 from enums.level_location import LevelLocation
+from interface.lines_view import lines_view, build_lines
 
 
 class DebugAction(GameActionsProperties, object):
@@ -26,6 +27,8 @@ class DebugAction(GameActionsProperties, object):
             'o': self.draw_path_to_passage_down,
             'p': self.draw_path_from_up_to_down,
             'r': self.toggle_path_heuristic_cross,
+            's': self.show_instrumentation,
+            'S': self.toggle_instrumentation,
             'v': self.show_map,
             'x': self.ascend_to_surface,
             'y': self.toggle_log_keycodes,
@@ -50,7 +53,7 @@ class DebugAction(GameActionsProperties, object):
 
     def add_monster(self):
         if self.level.creature_spawn_list:
-            self.level.spawn_creature(Creature(random.choice(self.level.creature_spawn_list)))
+            self.level.spawn_creature(Creature(self.level.spawn_random.choice(self.level.creature_spawn_list)))
             self.update_without_acting()
         else:
             self.io.msg("No random spawning on this level. Can't add monster.")
@@ -116,6 +119,18 @@ class DebugAction(GameActionsProperties, object):
         code.interact(local=locals())
         self.io.resume()
 
+    def show_instrumentation(self):
+        if not instruments.enabled and not instruments.timers:
+            self.toggle_instrumentation()
+            return
+        lines_view(self.io.whole_window, build_lines(instruments.get_report_lines()), header="Instrumentation")
+
+    def toggle_instrumentation(self):
+        instruments.enabled = not instruments.enabled
+        if instruments.enabled:
+            instruments.reset()
+        self.io.msg("Instrumentation set to {}".format(instruments.enabled))
+
     def toggle_log_keycodes(self):
         Debug.show_keycodes = not Debug.show_keycodes
         self.io.msg("Input code debug set to {}".format(Debug.show_keycodes))
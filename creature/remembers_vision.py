@@ -1,18 +1,30 @@
-from collections import defaultdict
+from generic_structures import CoordBitmap
 
 
 class RemembersVision(object):
 
-    """Creatures with this mixin class remember the level squares they've seen."""
+    """
+    Creatures with this mixin class remember the level squares they've seen.
+
+    The remembered squares of each level are kept in a CoordBitmap by level key.
+    """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.visited_locations = defaultdict(set)
-        self.vision = set()
+        self.visited_locations = {}
+        self.vision = frozenset()
 
     def get_visited_locations(self):
-        return self.visited_locations[self.level]
+        if self.level is None:
+            return frozenset()
+
+        level_key = self.level.key
+        visited = self.visited_locations.get(level_key)
+        if visited is None:
+            visited = CoordBitmap(self.level.tiles.dimensions)
+            self.visited_locations[level_key] = visited
+        return visited
 
     @property
     def vision(self):
@@ -20,7 +32,22 @@ class RemembersVision(object):
 
     @vision.setter
     def vision(self, coordinates):
-        self.visited_locations[self.level] |= coordinates
+        self.set_vision(coordinates)
+
+    def set_vision(self, coordinates, bitmap=None):
+        """
+        Set vision to coordinates and remember them.
+
+        bitmap is an optional CoordBitmap of coordinates, the one
+        Level.get_light_bitmap gives for the coord and sight of the creature. The
+        rows within sight of it are ORed into the remembered squares at once.
+        """
+        if bitmap is not None:
+            y = self.coord[0]
+            visited = self.get_visited_locations()
+            visited.update_rows(bitmap, max(y - self.sight, 0), min(y + self.sight + 1, visited.rows))
+        elif coordinates:
+            self.get_visited_locations().update(coordinates)
         self._vision = coordinates
 
     @vision.deleter
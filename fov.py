@@ -1,3 +1,5 @@
+from math import isqrt
+
 from generic_algorithms import bresenham
 
 
@@ -13,18 +15,29 @@ class ShadowCast(object):
 
     @classmethod
     def get_light_set(self, visibility_func, coord, sight, max_rows, max_cols):
+        see_through = _VisibilityFuncPlane(visibility_func, max_cols)
+        return self.get_light_set_from_plane(see_through, coord, sight, max_rows, max_cols)
+
+    @classmethod
+    def get_light_set_from_plane(self, see_through, coord, sight, max_rows, max_cols):
+        """
+        Return the set of coords lit from coord.
+
+        see_through is a flat row-major sequence of max_rows * max_cols truth
+        values, eg. the see_through plane of LevelTiles.
+        """
         y, x = coord
         light_set = set()
         light_set.add(coord)
         for octant in range(8):
-            self._shadow_cast(light_set, visibility_func, y, x, 1, 1.0, 0.0, sight, max_rows, max_cols,
+            self._shadow_cast(light_set, see_through, y, x, 1, 1.0, 0.0, sight, max_rows, max_cols,
                     self._mult[0][octant], self._mult[1][octant], self._mult[2][octant], self._mult[3][octant])
         return light_set
 
     # Based on an algorithm by Bjorn Bergstrom bjorn.bergstrom@roguelikedevelopment.org
     # http://roguebasin.roguelikedevelopment.org/index.php?title=FOV_using_recursive_shadowcasting
     @classmethod
-    def _shadow_cast(self, light_set, visibility_func, cy, cx, row, start, end, r, max_rows, max_cols, xx, xy, yx, yy):
+    def _shadow_cast(self, light_set, see_through, cy, cx, row, start, end, r, max_rows, max_cols, xx, xy, yx, yy):
         """Recursive lightcasting function."""
         if start < end:
             return
@@ -55,16 +68,16 @@ class ShadowCast(object):
 
                         if blocked:
                             # we're scanning a row of blocked squares:
-                            if not visibility_func((Y, X)):
+                            if not see_through[Y * max_cols + X]:
                                 new_start = r_slope
                             else:
                                 blocked = False
                                 start = new_start
                         else:
-                            if not visibility_func((Y, X)) and j < r:
+                            if not see_through[Y * max_cols + X] and j < r:
                                 # This is a blocking square, start a child scan:
                                 blocked = True
-                                self._shadow_cast(light_set, visibility_func, cy, cx, j + 1, start, l_slope, r,
+                                self._shadow_cast(light_set, see_through, cy, cx, j + 1, start, l_slope, r,
                                             max_rows, max_cols, xx, xy, yx, yy)
                                 new_start = r_slope
 
@@ -73,6 +86,18 @@ class ShadowCast(object):
                 break
 
 
+class _VisibilityFuncPlane(object):
+
+    """Adapts a coord based visibility function to the flat plane interface of ShadowCast."""
+
+    def __init__(self, visibility_func, cols):
+        self.visibility_func = visibility_func
+        self.cols = cols
+
+    def __getitem__(self, index):
+        return self.visibility_func(divmod(index, self.cols))
+
+
 class Bresenham(object):
 
     _mult = (
@@ -102,3 +127,133 @@ class Bresenham(object):
                     if not visibility_func((y, x)):
                         break
         return light_set
+
+    @classmethod
+    def get_light_set_from_plane(self, see_through, coord, sight, max_rows, max_cols):
+        def visibility_func(coord):
+            y, x = coord
+            return 0 <= y < max_rows and 0 <= x < max_cols and see_through[y * max_cols + x]
+
+        light_set = self.get_light_set(visibility_func, coord, sight)
+        return {(y, x) for y, x in light_set if 0 <= y < max_rows and 0 <= x < max_cols}
+
+
+class SymmetricShadowCast(object):
+
+    """
+    Symmetric shadowcasting which processes whole row segments at once.
+
+    Each quadrant row is read as one (possibly strided) slice of the flat
+    see_through plane and its runs of transparent and opaque cells are found with
+    bytearray.find instead of testing every cell. The visible runs are written to
+    a row-major bytearray mask with slice assignment.
+
+    Based on the algorithm by Albert Ford:
+    https://www.albertford.com/shadowcasting/
+    """
+
+    @classmethod
+    def get_light_set_from_plane(self, see_through, coord, sight, max_rows, max_cols):
+        mask = self.get_light_mask(see_through, coord, sight, max_rows, max_cols)
+        return self.get_light_set_from_mask(mask, coord, sight, max_rows, max_cols)
+
+    @classmethod
+    def get_light_set_from_mask(self, mask, coord, sight, max_rows, max_cols):
+        """Return the set of coords lit in mask, a light mask of coord and sight."""
+        y, x = coord
+        light_set = set()
+        for row in range(max(y - sight, 0), min(y + sight + 1, max_rows)):
+            row_index = row * max_cols
+            col_start = max(x - sight, 0)
+            col_limit = min(x + sight + 1, max_cols)
+            col = mask.find(1, row_index + col_start, row_index + col_limit)
+            while col != -1:
+                light_set.add((row, col - row_index))
+                col = mask.find(1, col + 1, row_index + col_limit)
+        return light_set
+
+    @classmethod
+    def get_light_mask(self, see_through, coord, sight, max_rows, max_cols):
+        """Return a row-major bytearray with 1 for every coord lit from coord."""
+        y, x = coord
+        mask = bytearray(max_rows * max_cols)
+        origin_index = y * max_cols + x
+        mask[origin_index] = 1
+
+        # depth_step, col_step, max depth, min col, max col for north, south, east and west quadrants
+        quadrants = (
+            (-max_cols, 1,        y,                -x, max_cols - 1 - x),
+            (max_cols,  1,        max_rows - 1 - y, -x, max_cols - 1 - x),
+            (1,         max_cols, max_cols - 1 - x, -y, max_rows - 1 - y),
+            (-1,        max_cols, x,                -y, max_rows - 1 - y),
+        )
+        for depth_step, col_step, max_depth, min_col, max_col in quadrants:
+            self._scan_quadrant(see_through, mask, origin_index, sight, depth_step, col_step,
+                                min(max_depth, sight), min_col, max_col)
+        return mask
+
+    @classmethod
+    def _scan_quadrant(self, see_through, mask, origin_index, sight, depth_step, col_step,
+                       max_depth, min_col, max_col):
+        sight_squared = sight * sight
+        # Slopes are (numerator, denominator) pairs with a positive denominator
+        rows = [(1, (-1, 1), (1, 1))]
+        while rows:
+            depth, start, end = rows.pop()
+            if depth > max_depth:
+                continue
+
+            radius_col = isqrt(sight_squared - depth * depth)
+            start_num, start_den = start
+            end_num, end_den = end
+            # Row extremities are the slopes rounded ties towards the row center
+            lo = max((2 * depth * start_num + start_den) // (2 * start_den), -radius_col, min_col)
+            hi = min(-((end_den - 2 * depth * end_num) // (2 * end_den)), radius_col, max_col)
+            if lo > hi:
+                continue
+
+            length = hi - lo + 1
+            row_start = origin_index + depth * depth_step + lo * col_step
+            row_limit = row_start + length * col_step
+            cells = see_through[row_start:row_limit:col_step]
+
+            previous_is_floor = None
+            i = 0
+            while i < length:
+                col = lo + i
+                if cells[i]:
+                    j = cells.find(0, i)
+                    if j == -1:
+                        j = length
+                    if previous_is_floor is False:
+                        start_num, start_den = 2 * col - 1, 2 * depth
+                    # Floor cells are lit only when their centers are within the slopes
+                    lit_lo = max(col, -((-depth * start_num) // start_den))
+                    lit_hi = min(lo + j - 1, (depth * end_num) // end_den)
+                    if lit_lo <= lit_hi:
+                        lit_start = origin_index + depth * depth_step + lit_lo * col_step
+                        lit_count = lit_hi - lit_lo + 1
+                        mask[lit_start:lit_start + lit_count * col_step:col_step] = b'\x01' * lit_count
+                    previous_is_floor = True
+                else:
+                    j = cells.find(1, i)
+                    if j == -1:
+                        j = length
+                    # Walls are always lit
+                    wall_start = origin_index + depth * depth_step + col * col_step
+                    mask[wall_start:wall_start + (j - i) * col_step:col_step] = b'\x01' * (j - i)
+                    if previous_is_floor:
+                        rows.append((depth + 1, (start_num, start_den), (2 * col - 1, 2 * depth)))
+                    previous_is_floor = False
+                i = j
+
+            if previous_is_floor:
+                rows.append((depth + 1, (start_num, start_den), (end_num, end_den)))
+
+
+# Selectable with GameConf.fov_algorithm
+algorithms = {
+    "shadowcast": ShadowCast,
+    "symmetric_shadowcast": SymmetricShadowCast,
+    "bresenham": Bresenham,
+}
@@ -5,11 +5,13 @@ from bindings import Bind
 from config.debug import Debug
 from config.game import GameConf
 from controllers.user_controller import UserController
-from fov import ShadowCast
 from game_actions import GameActions
 from game_data.pyrl_world import get_world
+from instrumentation import timed
 from interface.status_texts import register_status_texts
 from window.window_system import WindowSystem
+from world.level_pregenerator import LevelPregenerator
+from world.offscreen_simulation import OffscreenSimulator
 from world.world import LevelNotFound
 from creature.remembers_vision import RemembersVision
 
@@ -20,15 +22,23 @@ class Game(object):
         self.game_name = game_name
         self.ai = AI()
         self.turn_counter = 0
+        self.last_autosave_turn = 0
         self.time = 0
 
-        self.world = get_world()
+        self.world = get_world(GameConf.world_seed)
         self.io, self.user_controller = self.init_nonserializable_objects(cursor_lib)
 
     def init_nonserializable_objects(self, cursor_lib_callback):
         self.io = WindowSystem(cursor_lib_callback())
         self.user_controller = UserController(GameActions(self, self.player))
         register_status_texts(self.io, self, self.player)
+        self.background_saver = state_store.BackgroundSaver()
+        # Headless games update the game state but skip drawing and autosaving
+        self.headless = False
+        self.offscreen_simulator = OffscreenSimulator(GameConf.offscreen_buckets_per_turn)
+        if GameConf.pregenerate_levels:
+            self.world.level_pregenerator = LevelPregenerator(GameConf.pregeneration_workers)
+            self.world.pregenerate_adjacent_levels(self.active_level.key)
         return self.io, self.user_controller
 
     player = property(lambda self: self.world.player)
@@ -38,45 +48,59 @@ class Game(object):
         ai_game_actions = GameActions(self)
         self.io.msg("{0} for help menu".format(Bind.Help.key))
         while True:
-            creature, time_delta = self.active_level.turn_scheduler.advance_time()
-            self.time += time_delta
+            self.play_turn(ai_game_actions)
 
-            if creature is self.player:
-                self.update_view(creature)
-                self.user_controller.actions._clear_action()
-                self.user_controller.act()
-                action_cost = self.user_controller.actions.action_cost
+    def play_turn(self, ai_game_actions):
+        """Advance time to the next creature in turn and let it act."""
+        creature, time_delta = self.active_level.turn_scheduler.advance_time()
+        self.time += time_delta
 
-                if action_cost > 0:
-                    self.turn_counter += 1
-            else:
-                ai_game_actions._clear_action(and_associate_creature=creature)
-                self.ai.act(ai_game_actions, self.player.coord)
-                action_cost = ai_game_actions.action_cost
+        if creature is self.player:
+            self.update_view(creature)
+            if GameConf.offscreen_simulation:
+                self.offscreen_simulator.step(self.world, self.active_level, self.time)
+            if not self.headless:
+                self.autosave()
+            self.user_controller.actions._clear_action()
+            self.user_controller.act()
+            action_cost = self.user_controller.actions.action_cost
+
+            if action_cost > 0:
+                self.turn_counter += 1
+        else:
+            ai_game_actions._clear_action(and_associate_creature=creature)
+            self.ai.act(ai_game_actions, self.player.coord)
+            action_cost = ai_game_actions.action_cost
 
-            assert action_cost >= 0, \
-                "Negative cost actions are not allowed (yet at least).{}".format(action_cost)
+        assert action_cost >= 0, \
+            "Negative cost actions are not allowed (yet at least).{}".format(action_cost)
 
-            creature_check, time_delta = self.active_level.turn_scheduler.addpop(creature, action_cost)
-            assert creature is creature_check
-            assert time_delta == 0
+        creature_check, time_delta = self.active_level.turn_scheduler.addpop(creature, action_cost)
+        assert creature is creature_check
+        assert time_delta == 0
+        return creature
 
+    @timed("world.level_change")
     def move_creature_to_level(self, creature, world_point):
         try:
             target_level = self.world.get_level(world_point.level_key)
         except LevelNotFound:
             return False
 
+        if creature is self.player and GameConf.offscreen_simulation:
+            creature.level.simulated_time = self.time
+            self.offscreen_simulator.catch_up(target_level, self.time)
+
         creature.level.remove_creature(creature)
         target_level.add_creature_to_location(creature, world_point.level_location)
 
-        try:
-            creature.vision.clear()
-        except AttributeError:
-            pass
+        if isinstance(creature, RemembersVision):
+            creature.vision = frozenset()
 
         if creature is self.player:
-            self.redraw()
+            self.world.pregenerate_adjacent_levels(world_point.level_key)
+            if not self.headless:
+                self.redraw()
 
         return True
 
@@ -88,18 +112,40 @@ class Game(object):
         creature.level.remove_creature(creature)
 
     def endgame(self):
+        if self.world.level_pregenerator is not None:
+            self.world.level_pregenerator.shutdown()
         exit()
 
     def savegame(self):
+        self.background_saver.wait()
         try:
             raw, compressed = state_store.save(self, self.game_name)
         except IOError as e:
             msg_str = str(e)
         else:
-            msg_str = "Saved game '{}', file size: {:,} b, {:,} b compressed. Ratio: {:.2%}"
-            msg_str = msg_str.format(self.game_name, raw, compressed, raw / compressed)
+            msg_str = self._get_save_message("Saved", raw, compressed)
         return msg_str
 
+    def autosave(self):
+        """Report finished autosaves and start a new one in the background when it is due."""
+        finished = self.background_saver.poll()
+        if finished is not None:
+            if finished.exception() is not None:
+                self.io.msg("Autosave failed: {}".format(finished.exception()))
+            else:
+                self.io.msg(self._get_save_message("Autosaved", *finished.result()))
+
+        interval = GameConf.autosave_interval
+        if interval and self.turn_counter - self.last_autosave_turn >= interval:
+            if self.background_saver.start(self, self.game_name):
+                self.last_autosave_turn = self.turn_counter
+                self.io.msg("Autosaving...")
+
+    def _get_save_message(self, verb, raw, compressed):
+        msg_str = "{} game '{}', file size: {:,} b, {:,} b compressed. Ratio: {:.2%}"
+        return msg_str.format(verb, self.game_name, raw, compressed, raw / compressed)
+
+    @timed("render.update_view")
     def update_view(self, creature):
         """
         Update the vision set of the creature.
@@ -111,9 +157,11 @@ class Game(object):
             raise ValueError("Creature {} doesn't have the capacity to remember its vision.")
 
         lvl = creature.level
-        new_vision = ShadowCast.get_light_set(lvl.is_see_through, creature.coord,
-                                              creature.sight, lvl.rows, lvl.cols)
-        creature.vision, old_vision = new_vision, creature.vision
+        new_vision = lvl.get_light_set(creature.coord, creature.sight)
+        old_vision = creature.vision
+        creature.set_vision(new_vision, lvl.get_light_bitmap(creature.coord, creature.sight))
+        if self.headless:
+            return
         potentially_modified_vision = new_vision | old_vision
 
         if Debug.show_map:
@@ -128,7 +176,9 @@ class Game(object):
             reverse_data = lvl.get_vision_information(new_vision, new_vision)
             self.io.draw(reverse_data, True)
 
+    @timed("render.redraw")
     def redraw(self):
+        self.io.invalidate()
         self.io.level_window.clear()
         lvl = self.active_level
 
@@ -146,11 +196,12 @@ class Game(object):
             self.io.draw(reverse_data, True)
 
     def __getstate__(self):
-        exclude_state = ('user_controller', 'io')
+        exclude_state = ('user_controller', 'io', 'background_saver', 'headless', 'offscreen_simulator')
         state = vars(self).copy()
         for item in exclude_state:
             del state[item]
         return state
 
     def __setstate__(self, state):
+        state.setdefault('last_autosave_turn', state['turn_counter'])
         vars(self).update(state)
@@ -188,7 +188,7 @@ class GameActions(object):
         else:
             target = self.level.tiles[target_coord]
 
-        succeeds, damage = get_melee_attack_cr(self.creature, target)
+        succeeds, damage = get_melee_attack_cr(self.creature, target, self.level.combat_random)
         died = False
         if damage:
             target.receive_damage(damage)
@@ -242,10 +242,11 @@ class GameActions(object):
 
     def get_coords_of_creatures_in_vision(self, include_player=False):
         """Free action."""
-        if include_player:
-            return self.creature.vision & self.level.creatures.keys()
-        else:
-            return self.creature.vision & self.level.creatures.keys() - {self.coord}
+        creature = self.creature
+        coords = self.level.get_creature_coords_in_vision(creature.coord, creature.sight, creature.vision)
+        if not include_player:
+            coords.discard(self.coord)
+        return coords
 
     def view_floor_items(self):
         """Free action."""
@@ -277,8 +278,7 @@ class GameActions(object):
 
     def target_in_sight(self, target_coord):
         """Free action."""
-        return (self.target_within_sight_distance(target_coord) and
-                self.level.check_los(self.coord, target_coord))
+        return self.coord in self.level.get_los_set(target_coord, self.creature.sight)
 
     @player_action
     def save(self):
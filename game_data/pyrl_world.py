@@ -4,9 +4,9 @@ from enums.level_location import LevelLocation
 from world.world import World, LevelKey, WorldPoint
 
 
-def get_world():
+def get_world(seed=None):
 
-    world = World(Player())
+    world = World(Player(), seed)
     start = LevelKey("dungeon", 1)
     world.add_level(start.dungeon, test_level.get_level(world.player))
 
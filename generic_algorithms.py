@@ -1,4 +1,4 @@
-import fractions
+from math import gcd as greatest_common_divisor
 
 from enums.directions import Dir
 
@@ -60,7 +60,7 @@ def cross_product(line_start_coord, wild_coord, line_finish_coord):
 
 def minimize_vector(vector):
     a, b = vector
-    gcd = abs(fractions.gcd(a, b))
+    gcd = abs(greatest_common_divisor(a, b))
     return a // gcd, b // gcd
 
 
@@ -98,7 +98,7 @@ def clockwise_45(vector):
 
 def resize_vector_to_len(vector, length):
     a, b = vector
-    gcd = abs(fractions.gcd(a, b))
+    gcd = abs(greatest_common_divisor(a, b))
     a, b = a // gcd, b // gcd
     n = int(length / (a ** 2 + b ** 2) ** 0.5)
     return n * a, n * b
@@ -1,6 +1,8 @@
+from array import array
 from collections import namedtuple
-from itertools import zip_longest
-from random import randrange
+from collections.abc import Set
+from itertools import compress, zip_longest
+import random
 
 
 Coord = namedtuple("Coord", "y, x")
@@ -59,6 +61,10 @@ class Array2D(list):
     def __setitem__(self, coord, value):
         return super().__setitem__(self.get_index(coord), value)
 
+    def __reduce__(self):
+        # The default list reduction restores items with extend which is disabled
+        return self.__class__, (self.dimensions, list(self))
+
     def get_coord(self, index):
         return self.get_coord_from_index(index, self.cols)
 
@@ -82,28 +88,428 @@ class Array2D(list):
         for i, item in enumerate(self):
             yield self.get_coord(i)
 
-    def random_coord(self):
-        return randrange(self.rows), randrange(self.cols)
+    def random_coord(self, rng=random):
+        return rng.randrange(self.rows), rng.randrange(self.cols)
 
     @property
     def dimensions(self):
         return self.rows, self.cols
 
 
+class TypedGrid(object):
+
+    """
+    Non-dynamic two-dimensional grid of numbers stored in a typed array.
+
+    Sibling of Array2D for compact storage of small integers like tile ids. Uses
+    the same coordinate interface as Array2D and adds bulk operations on rows and
+    rectangles. Rectangles are (y_start, x_start, y_limit, x_limit) sequences like
+    the ones rdg.Rectangle returns.
+
+    grid[y, x] gets a single value and grid[y, x_start:x_limit] a copy of a row
+    segment. row_view(y) gives a zero-copy memoryview of a whole row.
+    """
+
+    def __init__(self, dimensions, init_values=(), fillvalue=0, typecode='B'):
+        self.rows, self.cols = dimensions
+        size = self.rows * self.cols
+        assert len(init_values) <= size, \
+            "Given init_values ({}) exceed size by dimensions ({}).".format(len(init_values), size)
+        self.data = array(typecode, init_values)
+        self.data.extend(array(typecode, [fillvalue]) * (size - len(self.data)))
+
+    def __getitem__(self, coord):
+        y, x = coord
+        if isinstance(x, slice):
+            start, stop, step = x.indices(self.cols)
+            return self.data[y * self.cols + start:y * self.cols + stop:step]
+        return self.data[self.get_index(coord)]
+
+    def __setitem__(self, coord, value):
+        y, x = coord
+        if isinstance(x, slice):
+            start, stop, step = x.indices(self.cols)
+            self.data[y * self.cols + start:y * self.cols + stop:step] = array(self.data.typecode, value)
+        else:
+            self.data[self.get_index(coord)] = value
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, TypedGrid):
+            return self.dimensions == other.dimensions and self.data == other.data
+        return NotImplemented
+
+    def get_coord(self, index):
+        return Array2D.get_coord_from_index(index, self.cols)
+
+    def get_index(self, coord):
+        return Array2D.get_index_from_coord(coord, self.cols)
+
+    def is_legal(self, coord):
+        y, x = coord
+        return (0 <= y < self.rows) and (0 <= x < self.cols)
+
+    def is_legal_rectangle(self, rectangle):
+        y_start, x_start, y_limit, x_limit = rectangle
+        return 0 <= y_start and 0 <= x_start and y_limit <= self.rows and x_limit <= self.cols
+
+    def enumerate(self):
+        for i, item in enumerate(self.data):
+            yield self.get_coord(i), item
+
+    def coord_iter(self):
+        cols = self.cols
+        for y in range(self.rows):
+            for x in range(cols):
+                yield y, x
+
+    def random_coord(self, rng=random):
+        return rng.randrange(self.rows), rng.randrange(self.cols)
+
+    def row_view(self, y):
+        """Return a zero-copy memoryview of row y."""
+        return memoryview(self.data)[y * self.cols:(y + 1) * self.cols]
+
+    def fill_rectangle(self, rectangle, value):
+        """Set every value inside rectangle to value."""
+        assert self.is_legal_rectangle(rectangle), "Rectangle {} outside grid.".format(rectangle)
+        y_start, x_start, y_limit, x_limit = rectangle
+        width = x_limit - x_start
+        if width <= 0:
+            return
+        row_values = array(self.data.typecode, [value]) * width
+        for y in range(y_start, y_limit):
+            index = y * self.cols + x_start
+            self.data[index:index + width] = row_values
+
+    def rectangle_in_set(self, rectangle, values):
+        """Return True if rectangle is inside the grid and all its values are in values."""
+        if not self.is_legal_rectangle(rectangle):
+            return False
+        y_start, x_start, y_limit, x_limit = rectangle
+        width = x_limit - x_start
+        values = frozenset(values)
+        for y in range(y_start, y_limit):
+            index = y * self.cols + x_start
+            if not values.issuperset(self.data[index:index + width]):
+                return False
+        return True
+
+    @property
+    def dimensions(self):
+        return self.rows, self.cols
+
+
+class CoordBitmap(Set):
+
+    """
+    Set of coordinates of a two-dimensional grid stored as one byte per cell.
+
+    Behaves like a set of (y, x) tuples. Set operations like | return
+    frozensets. Adding coordinates from another bitmap with |= is a single
+    bitwise OR of the grids. Pickled with one bit per cell.
+    """
+
+    def __init__(self, dimensions, coords=()):
+        self.rows, self.cols = dimensions
+        self.data = bytearray(self.rows * self.cols)
+        self.update(coords)
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return frozenset(iterable)
+
+    @classmethod
+    def from_mask(cls, dimensions, mask):
+        """Return a bitmap using mask, a row-major bytearray of 0 and 1 cells, as its data."""
+        bitmap = cls.__new__(cls)
+        bitmap.rows, bitmap.cols = dimensions
+        bitmap.data = mask
+        return bitmap
+
+    def __contains__(self, coord):
+        y, x = coord
+        return 0 <= y < self.rows and 0 <= x < self.cols and self.data[y * self.cols + x] == 1
+
+    def __iter__(self):
+        cols = self.cols
+        for index in compress(range(len(self.data)), self.data):
+            yield divmod(index, cols)
+
+    def __len__(self):
+        return self.data.count(1)
+
+    def __ior__(self, coords):
+        self.update(coords)
+        return self
+
+    def update(self, coords):
+        """Add coords, a bitmap of the same dimensions or an iterable of coordinates."""
+        if isinstance(coords, CoordBitmap):
+            assert self.dimensions == coords.dimensions, "Bitmap dimensions differ."
+            # Every cell is 0 or 1 so an OR of the whole grid as one integer can't carry
+            data = int.from_bytes(self.data, "little") | int.from_bytes(coords.data, "little")
+            self.data[:] = data.to_bytes(len(self.data), "little")
+        else:
+            data, cols = self.data, self.cols
+            for y, x in coords:
+                data[y * cols + x] = 1
+
+    def update_rows(self, bitmap, y_start, y_limit):
+        """Add the coords of bitmap on the rows from y_start to y_limit with a bitwise OR of those rows."""
+        assert self.dimensions == bitmap.dimensions, "Bitmap dimensions differ."
+        start, limit = y_start * self.cols, y_limit * self.cols
+        data = int.from_bytes(self.data[start:limit], "little") | int.from_bytes(bitmap.data[start:limit], "little")
+        self.data[start:limit] = data.to_bytes(limit - start, "little")
+
+    def __reduce__(self):
+        bits = int(self.data[::-1].translate(_bit_chars), 2) if self.data else 0
+        return _coord_bitmap_from_bits, (self.dimensions, bits)
+
+    @property
+    def dimensions(self):
+        return self.rows, self.cols
+
+
+# Translations between the cell values 0 and 1 and the characters "0" and "1"
+_bit_chars = bytes.maketrans(b"\0\1", b"01")
+_bit_values = bytes.maketrans(b"01", b"\0\1")
+
+
+def _coord_bitmap_from_bits(dimensions, bits):
+    bitmap = CoordBitmap(dimensions)
+    size = len(bitmap.data)
+    if size:
+        bitmap.data[:] = format(bits, "0{}b".format(size)).encode()[::-1].translate(_bit_values)
+    return bitmap
+
+
+class SpatialIndex(Set):
+
+    """
+    Set of coordinates bucketed in a uniform grid for queries by area.
+
+    Behaves like a set of (y, x) tuples. The coords are kept in square buckets
+    of bucket_size cells per side so radius, rectangle and nearest queries only
+    look at the buckets overlapping the area instead of every coord.
+
+    Distances are euclidean like sight radiuses: a coord is within radius r of
+    center if dy ** 2 + dx ** 2 <= r ** 2.
+    """
+
+    def __init__(self, coords=(), bucket_size=8):
+        self.bucket_size = bucket_size
+        # (bucket y, bucket x): set of coords
+        self.buckets = {}
+        self.size = 0
+        for coord in coords:
+            self.add(coord)
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return frozenset(iterable)
+
+    def __contains__(self, coord):
+        y, x = coord
+        size = self.bucket_size
+        bucket = self.buckets.get((y // size, x // size))
+        return bucket is not None and coord in bucket
+
+    def __iter__(self):
+        for bucket in self.buckets.values():
+            yield from bucket
+
+    def __len__(self):
+        return self.size
+
+    def add(self, coord):
+        y, x = coord
+        size = self.bucket_size
+        bucket = self.buckets.setdefault((y // size, x // size), set())
+        if coord not in bucket:
+            bucket.add(coord)
+            self.size += 1
+
+    def discard(self, coord):
+        y, x = coord
+        size = self.bucket_size
+        key = y // size, x // size
+        bucket = self.buckets.get(key)
+        if bucket is not None and coord in bucket:
+            bucket.remove(coord)
+            self.size -= 1
+            if not bucket:
+                del self.buckets[key]
+
+    def move(self, old_coord, new_coord):
+        self.discard(old_coord)
+        self.add(new_coord)
+
+    def in_rectangle(self, rectangle):
+        """Yield the coords in rectangle, a (y_start, x_start, y_limit, x_limit) tuple."""
+        y_start, x_start, y_limit, x_limit = rectangle
+        if y_start >= y_limit or x_start >= x_limit:
+            return
+        size, buckets = self.bucket_size, self.buckets
+        for bucket_y in range(y_start // size, (y_limit - 1) // size + 1):
+            for bucket_x in range(x_start // size, (x_limit - 1) // size + 1):
+                bucket = buckets.get((bucket_y, bucket_x))
+                if bucket is not None:
+                    for coord in bucket:
+                        y, x = coord
+                        if y_start <= y < y_limit and x_start <= x < x_limit:
+                            yield coord
+
+    def in_radius(self, center, radius):
+        """Yield the coords within radius of center."""
+        cy, cx = center
+        radius_squared = radius * radius
+        size, buckets = self.bucket_size, self.buckets
+        bucket_xs = range((cx - radius) // size, (cx + radius) // size + 1)
+        for bucket_y in range((cy - radius) // size, (cy + radius) // size + 1):
+            for bucket_x in bucket_xs:
+                bucket = buckets.get((bucket_y, bucket_x))
+                if bucket is not None:
+                    for coord in bucket:
+                        y, x = coord
+                        if (y - cy) * (y - cy) + (x - cx) * (x - cx) <= radius_squared:
+                            yield coord
+
+    def nearest(self, center, max_radius=None, exclude=()):
+        """
+        Return the coord closest to center not in exclude or None if there isn't one.
+
+        Buckets are searched in rings around the bucket of center until the next
+        ring can't have anything closer than the best found so far.
+        """
+        if not self.buckets:
+            return None
+        cy, cx = center
+        size, buckets = self.bucket_size, self.buckets
+        center_y, center_x = cy // size, cx // size
+        last_ring = max(max(abs(bucket_y - center_y), abs(bucket_x - center_x)) for bucket_y, bucket_x in buckets)
+        limit_squared = None if max_radius is None else max_radius * max_radius
+
+        best, best_squared = None, None
+        for ring in range(last_ring + 1):
+            if ring > 0:
+                # Every coord in this ring or further is at least this far
+                ring_distance = (ring - 1) * size + 1
+                if best_squared is not None and best_squared <= ring_distance * ring_distance:
+                    break
+                if limit_squared is not None and ring_distance * ring_distance > limit_squared:
+                    break
+            for key in _get_ring(center_y, center_x, ring):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    continue
+                for coord in bucket:
+                    y, x = coord
+                    distance_squared = (y - cy) ** 2 + (x - cx) ** 2
+                    if ((best_squared is None or distance_squared < best_squared)
+                            and (limit_squared is None or distance_squared <= limit_squared)
+                            and coord not in exclude):
+                        best, best_squared = coord, distance_squared
+        return best
+
+
+def _get_ring(center_y, center_x, ring):
+    """Yield the bucket keys at chebyshev distance ring from the center bucket."""
+    if ring == 0:
+        yield center_y, center_x
+        return
+    for bucket_x in range(center_x - ring, center_x + ring + 1):
+        yield center_y - ring, bucket_x
+        yield center_y + ring, bucket_x
+    for bucket_y in range(center_y - ring + 1, center_y + ring):
+        yield bucket_y, center_x - ring
+        yield bucket_y, center_x + ring
+
+
 class OneToOneMapping(dict):
 
-    """A dict-like object which guarantees uniqueness for values in addition to keys."""
+    """
+    A dict-like object which guarantees uniqueness for values in addition to keys.
+
+    An inverse dict of value: key is kept alongside so checking for a value and
+    getkey are constant time.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # Set here and not in __init__ since unpickling sets the items without calling __init__
+        mapping = super().__new__(cls)
+        mapping._inverse = {}
+        return mapping
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.update(*args, **kwargs)
 
     def __setitem__(self, key, value):
-        if value in self.values():
+        existing_key = self._inverse.get(value, key)
+        if existing_key != key:
             raise ValueError("Value {} already exists in mapping.".format(value))
+        if key in self:
+            del self._inverse[self[key]]
         super().__setitem__(key, value)
+        self._inverse[value] = key
+
+    def __delitem__(self, key):
+        del self._inverse[self[key]]
+        super().__delitem__(key)
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    def has_value(self, value):
+        return value in self._inverse
 
-    def getkey(self, arg_value):
-        for key, value in self.items():
-            if value == arg_value:
-                return key
-        raise KeyError("Value {} not found in mapping.".format(arg_value))
+    def getkey(self, value):
+        try:
+            return self._inverse[value]
+        except KeyError:
+            raise KeyError("Value {} not found in mapping.".format(value)) from None
+
+    def pop(self, key, *default):
+        if key in self:
+            value = super().pop(key)
+            del self._inverse[value]
+            return value
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        del self._inverse[value]
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        super().clear()
+        self._inverse.clear()
+
+    def copy(self):
+        return self.__class__(self)
+
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        mapping = self.copy()
+        mapping.update(other)
+        return mapping
+
+    def __ior__(self, other):
+        # dict.__ior__ would set the items without the value checks or the inverse
+        self.update(other)
+        return self
 
     def update(self, E=None, **kwords):
         if E is not None:
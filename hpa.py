@@ -0,0 +1,265 @@
+"""
+Hierarchical pathfinding (HPA*) over the tiles of a level.
+
+The level is partitioned into square clusters. Where passable tiles face each
+other across a cluster border they form an entrance and transitions are placed
+on it: one in the middle of a short entrance, one at both ends of a long one.
+Each transition is a pair of nodes, one on either side of the border. The
+abstract graph links the nodes of a transition with the cost of the step across
+the border and the nodes of a cluster with each other with the cost of the
+cheapest path that stays inside the cluster.
+
+A path is searched by connecting the start and goal to the nodes of their
+clusters, running A* on the small abstract graph and refining every abstract
+edge to tiles with an A* that stays inside the cluster of the edge. Paths within
+a cluster or to the clusters next to it are short and searched on the tiles
+directly. The longer paths are near optimal, a few percent longer than the flat
+A* paths on average.
+
+Changes to the passability or movement multiplier of tiles mark the clusters
+holding them dirty and only those clusters and their borders are rebuilt, on
+the next search.
+"""
+import path
+from enums.directions import Dir
+from game_actions import Action
+from generic_algorithms import add_vector, get_vector
+from instrumentation import timed
+
+
+class ClusterGraph(object):
+
+    cluster_size = 10
+    # Entrances at least this long get a transition at both ends instead of one in the middle
+    long_entrance_length = 6
+
+    def __init__(self, level):
+        self.level = level
+        rows, cols = level.tiles.dimensions
+        size = self.cluster_size
+        self.cluster_rows = (rows + size - 1) // size
+        self.cluster_cols = (cols + size - 1) // size
+        # border: list of (node, node, cost) transitions, borders are (cluster, cluster) pairs
+        self.transitions = {}
+        # node: {node of another cluster: cost}
+        self.links = {}
+        # cluster: {node: {node of the same cluster: cost}}
+        self.intra_edges = {}
+        self.dirty = set(self.get_clusters())
+        self.update()
+
+    def get_clusters(self):
+        return ((y, x) for y in range(self.cluster_rows) for x in range(self.cluster_cols))
+
+    def get_cluster(self, coord):
+        y, x = coord
+        return y // self.cluster_size, x // self.cluster_size
+
+    def get_cluster_rectangle(self, cluster):
+        """Return the (y_start, x_start, y_limit, x_limit) rectangle of cluster."""
+        rows, cols = self.level.tiles.dimensions
+        size = self.cluster_size
+        y, x = cluster
+        return y * size, x * size, min((y + 1) * size, rows), min((x + 1) * size, cols)
+
+    def get_cluster_nodes(self, cluster):
+        return self.intra_edges.get(cluster, {}).keys()
+
+    def mark_dirty(self, rectangle):
+        """Mark the clusters overlapping the tile rectangle for rebuilding."""
+        y_start, x_start, y_limit, x_limit = rectangle
+        size = self.cluster_size
+        for y in range(y_start // size, (y_limit - 1) // size + 1):
+            for x in range(x_start // size, (x_limit - 1) // size + 1):
+                self.dirty.add((y, x))
+
+    def update(self):
+        """Rebuild the dirty clusters, their borders and the clusters whose nodes changed with them."""
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, set()
+        borders = {border for cluster in dirty for border in self._get_borders(cluster)}
+        rebuilt = set(dirty)
+        for border in borders:
+            if self._build_border(border):
+                rebuilt.update(border)
+        for cluster in rebuilt:
+            self._build_intra_edges(cluster)
+
+    def path(self, start_coord, goal_coord):
+        """
+        Return a list of the coords of a path from start_coord to goal_coord.
+
+        The list starts from the coord after start_coord and ends in goal_coord
+        like the paths of path.path. Raise PathException if there is no path.
+        """
+        start_cluster, goal_cluster = self.get_cluster(start_coord), self.get_cluster(goal_coord)
+        if abs(start_cluster[0] - goal_cluster[0]) <= 1 and abs(start_cluster[1] - goal_cluster[1]) <= 1:
+            return self._flat_path(start_coord, goal_coord)
+        return self._hierarchical_path(start_coord, goal_coord, start_cluster, goal_cluster)
+
+    @timed("path.flat_a_star")
+    def _flat_path(self, start_coord, goal_coord):
+        level = self.level
+        return list(path.path(start_coord, goal_coord, level.get_neighbor_location_coords_and_costs,
+                              level._a_star_heuristic))
+
+    @timed("path.hierarchical_a_star")
+    def _hierarchical_path(self, start_coord, goal_coord, start_cluster, goal_cluster):
+        level = self.level
+        self.update()
+        start_costs = self._get_node_costs(start_coord, start_cluster)
+        goal_costs = self._get_node_costs(goal_coord, goal_cluster)
+        endpoint_costs = {start_coord: start_costs, goal_coord: goal_costs}
+        intra_edges, links = self.intra_edges, self.links
+        get_cluster = self.get_cluster
+
+        def abstract_neighbors(node):
+            if node in endpoint_costs:
+                yield from endpoint_costs[node].items()
+            yield from intra_edges[get_cluster(node)].get(node, {}).items()
+            yield from links.get(node, {}).items()
+            if node in start_costs:
+                yield start_coord, start_costs[node]
+            if node in goal_costs:
+                yield goal_coord, goal_costs[node]
+
+        came_from = path._a_star(start_coord, goal_coord, abstract_neighbors, level._a_star_heuristic)
+        return self._refine(path._iterate_path(came_from, start_coord, goal_coord), start_coord)
+
+    def _refine(self, abstract_path, start_coord):
+        coords = []
+        previous = start_coord
+        for node in abstract_path:
+            if node in self.links.get(previous, ()):
+                coords.append(node)
+            else:
+                cluster = self.get_cluster(node)
+                coords.extend(path.path(previous, node, self._get_cluster_neighbor_function(cluster),
+                                        self.level._a_star_heuristic))
+            previous = node
+        return coords
+
+    def _get_node_costs(self, coord, cluster):
+        """Return a dict of the cost from coord to the nodes of cluster reachable inside it."""
+        costs = path.dijkstra_map(coord, self._get_cluster_neighbor_function(cluster))
+        return {node: costs[node] for node in self.get_cluster_nodes(cluster) if node in costs}
+
+    def _get_cluster_neighbor_function(self, cluster):
+        y_start, x_start, y_limit, x_limit = self.get_cluster_rectangle(cluster)
+        neighbors = self.level.get_neighbor_location_coords_and_costs
+
+        def cluster_neighbors(coord):
+            for node, cost in neighbors(coord):
+                y, x = node
+                if y_start <= y < y_limit and x_start <= x < x_limit:
+                    yield node, cost
+        return cluster_neighbors
+
+    def _get_borders(self, cluster):
+        y, x = cluster
+        if y > 0:
+            yield (y - 1, x), cluster
+        if x > 0:
+            yield (y, x - 1), cluster
+        if y + 1 < self.cluster_rows:
+            yield cluster, (y + 1, x)
+        if x + 1 < self.cluster_cols:
+            yield cluster, (y, x + 1)
+        # Diagonal neighbors of the cluster, which only share a corner
+        for dy, dx in Dir.Diagonals:
+            neighbor = y + dy, x + dx
+            if 0 <= neighbor[0] < self.cluster_rows and 0 <= neighbor[1] < self.cluster_cols:
+                yield min(cluster, neighbor), max(cluster, neighbor)
+
+    def _build_border(self, border):
+        """Rebuild the transitions of border and return True if they changed."""
+        transitions = self._find_transitions(border)
+        old_transitions = self.transitions.get(border, [])
+        if transitions == old_transitions:
+            return False
+
+        links = self.links
+        for node_a, node_b, _ in old_transitions:
+            for node, other in ((node_a, node_b), (node_b, node_a)):
+                del links[node][other]
+                if not links[node]:
+                    del links[node]
+        for node_a, node_b, cost in transitions:
+            links.setdefault(node_a, {})[node_b] = cost
+            links.setdefault(node_b, {})[node_a] = cost
+        self.transitions[border] = transitions
+        return True
+
+    def _find_transitions(self, border):
+        (y_a, x_a), (y_b, x_b) = border
+        y_start, x_start, y_limit, x_limit = self.get_cluster_rectangle(border[0])
+        if y_a == y_b:
+            return self._find_side_transitions([(y, x_limit - 1) for y in range(y_start, y_limit)], Dir.East)
+        elif x_a == x_b:
+            return self._find_side_transitions([(y_limit - 1, x) for x in range(x_start, x_limit)], Dir.South)
+        elif x_a < x_b:
+            return self._find_corner_transitions((y_limit - 1, x_limit - 1), Dir.SouthEast)
+        else:
+            return self._find_corner_transitions((y_limit - 1, x_start), Dir.SouthWest)
+
+    def _find_side_transitions(self, side, direction):
+        """Return the transitions from the coords of side to the coords next to them in direction."""
+        is_pathable = self.level.is_pathable
+        opposite = [add_vector(coord, direction) for coord in side]
+        open_pairs = [is_pathable(node_a) and is_pathable(node_b) for node_a, node_b in zip(side, opposite)]
+
+        transitions = []
+        entrance = []
+        for i, node_a in enumerate(side):
+            if open_pairs[i]:
+                entrance.append(i)
+            if entrance and (not open_pairs[i] or i == len(side) - 1):
+                if len(entrance) >= self.long_entrance_length:
+                    entrance = entrance[0], entrance[-1]
+                else:
+                    entrance = entrance[len(entrance) // 2],
+                for j in entrance:
+                    transitions.append(self._get_transition(side[j], opposite[j]))
+                entrance = []
+
+        # Coords not on an entrance can still connect diagonally
+        for i, node_a in enumerate(side):
+            if open_pairs[i] or not is_pathable(node_a):
+                continue
+            for j in (i - 1, i + 1):
+                if 0 <= j < len(side) and not open_pairs[j] and is_pathable(opposite[j]):
+                    transitions.append(self._get_transition(node_a, opposite[j]))
+        return transitions
+
+    def _find_corner_transitions(self, node_a, direction):
+        """Return the transition between clusters touching only at the corner node_a if there's one."""
+        is_pathable = self.level.is_pathable
+        node_b = add_vector(node_a, direction)
+        if not (is_pathable(node_a) and is_pathable(node_b)):
+            return []
+        # Through either of the other corner coords the clusters already connect by their sides
+        if is_pathable((node_a[0], node_b[1])) or is_pathable((node_b[0], node_a[1])):
+            return []
+        return [self._get_transition(node_a, node_b)]
+
+    def _get_transition(self, node_a, node_b):
+        direction = get_vector(node_a, node_b)
+        return node_a, node_b, round(self.level.movement_multiplier(node_a, direction) * Action.Move.base_cost)
+
+    def _build_intra_edges(self, cluster):
+        nodes = set()
+        for border in self._get_borders(cluster):
+            for node_a, node_b, _ in self.transitions.get(border, ()):
+                nodes.add(node_a if self.get_cluster(node_a) == cluster else node_b)
+
+        edges = {node: {} for node in nodes}
+        remaining = sorted(nodes)
+        neighbors = self._get_cluster_neighbor_function(cluster)
+        while remaining:
+            node = remaining.pop()
+            costs = path.dijkstra_map(node, neighbors)
+            for other in remaining:
+                if other in costs:
+                    edges[node][other] = edges[other][node] = costs[other]
+        self.intra_edges[cluster] = edges
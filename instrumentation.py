@@ -0,0 +1,133 @@
+"""
+Named counters and timers of the hot paths of the game.
+
+Functions are registered for timing with the @timed decorator and events are
+counted with count. The decorator leaves the function as it is: timing wrappers
+are only patched in place of the registered functions while instruments.enabled
+is set, so disabled timers cost nothing. Counters check the flag on every call
+so they belong on the less frequent paths, eg. cache misses.
+
+Timed functions have to be module level functions or methods of module level
+classes for them to be found again for patching. Callers that imported the
+function itself with "from module import func" keep calling the original.
+
+Timer names are dotted with the subsystem first, eg. "fov.light_set", which
+lets the stats be summed per subsystem. Timers are inclusive: a timed function
+calling another timed function is timed in both.
+"""
+import logging
+import sys
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from timeit import default_timer
+
+
+class Instruments(object):
+
+    def __init__(self):
+        self._enabled = False
+        # (function, timer name) of every registered function
+        self._timed_functions = []
+        # (owner, attribute name, original) of the currently patched functions
+        self._patched = []
+        self.reset()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        value = bool(value)
+        if value and not self._enabled:
+            self._patch()
+        elif not value and self._enabled:
+            self._unpatch()
+        self._enabled = value
+
+    def reset(self):
+        self.counters = defaultdict(int)
+        # name: [calls, total seconds, max seconds]
+        self.timers = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def count(self, name, amount=1):
+        if self._enabled:
+            self.counters[name] += amount
+
+    def timed(self, name):
+        """Decorator registering the function to be timed under name while enabled."""
+
+        def decorator(func):
+            self._timed_functions.append((func, name))
+            return func
+        return decorator
+
+    def _patch(self):
+        for func, name in self._timed_functions:
+            try:
+                owner, attribute = _find_owner(func)
+            except AttributeError:
+                logging.warning("Can't instrument {}, it isn't reachable from its module.".format(func.__qualname__))
+                continue
+            self._patched.append((owner, attribute, func))
+            setattr(owner, attribute, self._get_timer_wrapper(name, func))
+
+    def _unpatch(self):
+        while self._patched:
+            owner, attribute, func = self._patched.pop()
+            setattr(owner, attribute, func)
+
+    def _get_timer_wrapper(self, name, func):
+
+        @wraps(func)
+        def timer_wrapper(*args, **kwargs):
+            start = default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = default_timer() - start
+                timer = self.timers[name]
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+        return timer_wrapper
+
+    def get_subsystem_totals(self):
+        """Return an OrderedDict of subsystem: (calls, total seconds) summed over its timers."""
+        totals = OrderedDict()
+        for name, (calls, total, _) in sorted(self.timers.items()):
+            subsystem = name.split(".", 1)[0]
+            subsystem_calls, subsystem_total = totals.get(subsystem, (0, 0.0))
+            totals[subsystem] = subsystem_calls + calls, subsystem_total + total
+        return totals
+
+    def get_report_lines(self):
+        lines = ["{:<24} {:>10} {:>12} {:>10} {:>10}".format("timer", "calls", "total", "mean", "max")]
+        for name, (calls, total, longest) in sorted(self.timers.items()):
+            lines.append("{:<24} {:>10,} {:>9.1f} ms {:>7.3f} ms {:>7.3f} ms".format(
+                name, calls, total * 1000, total / calls * 1000, longest * 1000))
+        if self.counters:
+            lines.append("")
+            lines.append("{:<24} {:>10}".format("counter", "count"))
+            for name, value in sorted(self.counters.items()):
+                lines.append("{:<24} {:>10,}".format(name, value))
+        return lines
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            f.write("\n".join(self.get_report_lines()) + "\n")
+
+
+def _find_owner(func):
+    """Return the module or class holding func and the attribute name it's under."""
+    owner = sys.modules[func.__module__]
+    path = func.__qualname__.split(".")
+    for attribute in path[:-1]:
+        owner = getattr(owner, attribute)
+    return owner, path[-1]
+
+
+instruments = Instruments()
+timed = instruments.timed
+count = instruments.count
@@ -7,6 +7,7 @@ except ImportError:
 
 import curses.ascii
 import logging
+from operator import itemgetter
 
 from config.debug import Debug
 from enums.keys import Key
@@ -17,6 +18,39 @@ from window.window_system import WindowSystem
 IMPLEMENTATION = "curses"
 
 
+def get_runs(char_payload_sequence):
+    """
+    Return the cells as runs of horizontally adjacent cells with the same color.
+
+    The runs are (y, x, string, color) tuples in row-major order. If a
+    coordinate is given many times the last one is used.
+    """
+    runs = []
+    symbols = []
+    run_y = run_x = next_x = run_color = None
+    # The sort is stable so the last cell of a coordinate is the last of its duplicates
+    for (y, x), (symbol, color) in sorted(char_payload_sequence, key=itemgetter(0)):
+        if y == run_y and x == next_x - 1:
+            # Same coordinate again, replace the previous cell
+            symbols.pop()
+            if color == run_color:
+                symbols.append(symbol)
+                continue
+            next_x = x
+
+        if x == next_x and y == run_y and color == run_color:
+            symbols.append(symbol)
+        else:
+            if symbols:
+                runs.append((run_y, run_x, "".join(symbols), run_color))
+            run_y, run_x, run_color = y, x, color
+            symbols = [symbol]
+        next_x = x + 1
+    if symbols:
+        runs.append((run_y, run_x, "".join(symbols), run_color))
+    return runs
+
+
 def clean_curses():
     """Resume normal shell state. Does nothing if curses wasn't initialized."""
     try:
@@ -113,16 +147,13 @@ class CursesWindow(object):
             self.win.addstr(y, x, string, self.color_map[color])
 
     def draw(self, char_payload_sequence):
-        local_addch = self.win.addch
+        local_addstr = self.win.addstr
         local_color = self.color_map
-        for (y, x), (symbol, color) in char_payload_sequence:
-            local_addch(y, x, symbol, local_color[color])
+        for y, x, string, color in get_runs(char_payload_sequence):
+            local_addstr(y, x, string, local_color[color])
 
     def draw_reverse(self, char_payload_sequence):
-        local_addch = self.win.addch
-        local_color = self.color_map
-        for (y, x), (symbol, (fg, bg)) in char_payload_sequence:
-            local_addch(y, x, symbol, local_color[bg, fg])
+        self.draw((coord, (symbol, (bg, fg))) for coord, (symbol, (fg, bg)) in char_payload_sequence)
 
     def clear(self):
         self.win.erase()
@@ -9,11 +9,14 @@ from cProfile import Profile
 import state_store
 from config.debug import Debug
 from config.game import GameConf
+from instrumentation import instruments
 from tools import profile_util
+from tools.sampling_profiler import SamplingProfiler
 
 
 def start(cursor_lib_callback):
     game = prepare_game(cursor_lib_callback)
+    atexit.register(write_instrumentation_results)
     game.main_loop()
 
 
@@ -31,7 +34,7 @@ def prepare_game(cursor_lib_callback, cmdline_args=None):
         from game import Game
         game = Game(options.game, cursor_lib_callback)
 
-    if options.profile:
+    if options.profile == "cprofile":
         profiler = Profile()
         profiler.enable()
 
@@ -41,9 +44,27 @@ def prepare_game(cursor_lib_callback, cmdline_args=None):
 
         atexit.register(write_profile)
 
+    elif options.profile == "sample":
+        sampler = SamplingProfiler()
+        sampler.start()
+
+        def write_samples():
+            sampler.stop()
+            sampler.write_collapsed(Debug.sampling_output_file)
+
+        atexit.register(write_samples)
+
+    if options.instrument:
+        instruments.enabled = True
+
     return game
 
 
+def write_instrumentation_results():
+    if instruments.timers or instruments.counters:
+        instruments.dump(Debug.instrumentation_output_file)
+
+
 def init_logger_system():
     logging.basicConfig(filename=Debug.log_file, level=Debug.log_level)
     logging.debug("Starting new session")
@@ -56,7 +77,11 @@ def get_commandline_options(args=None):
     start_group.add_argument("-g", "--game", help="Specify the name for a new game.",
                              nargs="?", const=GameConf.default_game_name, default=GameConf.default_game_name)
     start_group.add_argument("-l", "--load", help="Specify the game to be loaded.", nargs="?", const=GameConf.default_game_name)
-    parser.add_argument("-p", "--profile", help="Generate profiling data during the game.", action="store_true")
+    parser.add_argument("-p", "--profile", help="Generate profiling data during the game. 'cprofile' (default) "
+                        "profiles every call, 'sample' takes stack samples with little overhead.",
+                        nargs="?", const="cprofile", choices=("cprofile", "sample"))
+    parser.add_argument("-i", "--instrument", help="Record the counters and timers of the hot paths during the game.",
+                        action="store_true")
 
     return parser.parse_args(args)
 
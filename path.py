@@ -45,6 +45,29 @@ def _a_star(start, goal, neighbors, heuristic):
         raise PathException("No possible paths between arguments start:{} goal:{}".format(start, goal))
 
 
+def dijkstra_map(goal, neighbors):
+    """
+    Return a dict of the movement cost from every reachable coord to goal.
+
+    Costs given by neighbors are assumed symmetric so the map is grown outward
+    from goal.
+    """
+    costs = {goal: 0}
+    openprio = [(0, goal)]
+
+    while openprio:
+        cost, origin = heappop(openprio)
+        if cost > costs[origin]:
+            continue
+
+        for node, step_cost in neighbors(origin):
+            node_cost = cost + step_cost
+            if node not in costs or node_cost < costs[node]:
+                costs[node] = node_cost
+                heappush(openprio, (node_cost, node))
+    return costs
+
+
 def _iterate_path(came_from, start, goal):
     """Iterate the path structure returned by _path()."""
     cur = start
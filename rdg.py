@@ -1,5 +1,4 @@
 from functools import partial
-from random import randrange, random, choice
 
 from config.debug import Debug
 from enums.directions import Dir
@@ -57,8 +56,17 @@ class RDG(object):
     W = PyrlTile.Wall
     R = PyrlTile.Rock
 
+    # Build directions of edges by the tile ids of their up, down, left and right neighbors
+    edge_directions = {
+        (R.id, F.id, W.id, W.id): Dir.North,
+        (F.id, R.id, W.id, W.id): Dir.South,
+        (W.id, W.id, R.id, F.id): Dir.West,
+        (W.id, W.id, F.id, R.id): Dir.East,
+    }
+
     def __init__(self, level):
         self.level = level
+        self.random = level.generation_random
         self.rows, self.cols = level.tiles.dimensions
         self.generation_type = level.generation_type
 
@@ -85,16 +93,16 @@ class RDG(object):
             self.make_room(Rectangle(0, 0, self.rows, self.cols))
 
         if self.generation_type.value >= LevelGen.Dungeon.value:
-            if LevelLocation.Passage_Up not in self.level.locations.values():
+            if not self.level.locations.has_value(LevelLocation.Passage_Up):
                 self.add_location(PyrlTile.Stairs_Up, LevelLocation.Passage_Up)
-            if LevelLocation.Passage_Down not in self.level.locations.values():
+            if not self.level.locations.has_value(LevelLocation.Passage_Down):
                 self.add_location(PyrlTile.Stairs_Down, LevelLocation.Passage_Down)
 
     def init_tiles(self):
-        for coord, item in self.level.tiles.enumerate():
-            self.level.tiles[coord] = self.R
+        self.level.tiles.fill_rectangle(Rectangle(0, 0, self.rows, self.cols), self.R)
 
     def generator_loop(self):
+        randrange = self.random.randrange
         rand_room_height = partial(randrange, *self.room_y_range)
         rand_room_width = partial(randrange, *self.room_x_range)
         rand_corridor_height = partial(randrange, *self.corridor_y_range)
@@ -105,7 +113,7 @@ class RDG(object):
         for _ in range(self.level_cycles):
 
             (door_y, door_x), (y_dir, x_dir) = self.get_wall_coord_and_dir()
-            artifact_roll = random()
+            artifact_roll = self.random.random()
 
             if corridor_start <= artifact_roll < corridor_limit:
 
@@ -141,7 +149,7 @@ class RDG(object):
             neighbors = self.get_up_down_left_right_neighbors(coord)
             old_tile = self.level.tiles[coord]
 
-            if neighbors == (self.F, self.F, self.F, self.F) and old_tile == self.F:
+            if neighbors == (self.F.id, self.F.id, self.F.id, self.F.id) and old_tile == self.F:
                 break
         else:
             assert False, "Location add failed due to free coord get failed."
@@ -150,6 +158,7 @@ class RDG(object):
         self.level.locations[coord] = location
 
     def make_initial_room(self):
+        randrange = self.random.randrange
         while True:
             height, width = randrange(5, 11), randrange(7, 14)
             if height * width <= 8 * 8:
@@ -163,7 +172,7 @@ class RDG(object):
 
             x_scale = self.cols - width
             x = randrange((x_scale // 8) * 3, (x_scale // 8) * 5)
-            if self.rectangle_consists_of_tiles(Rectangle(y, x, height, width), (self.W, self.R)):
+            if self.rectangle_is_impassable(Rectangle(y, x, height, width)):
                 break
 
         self.make_room(Rectangle(y, x, height, width))
@@ -180,7 +189,7 @@ class RDG(object):
         # Floor part of corridor. length - 1 because floor part ends before corridor end wall
         floor_rectangle = Rectangle(y, x, y_dir * (length - 1) + x_dir, x_dir * (length - 1) + y_dir)
 
-        if self.rectangle_consists_of_tiles(corridor_rectangle, (self.W, self.R)):
+        if self.rectangle_is_impassable(corridor_rectangle):
             self.set_rectangle(corridor_rectangle, self.W)
             self.set_rectangle(floor_rectangle, self.F)
             return True
@@ -188,7 +197,7 @@ class RDG(object):
             return False
 
     def attempt_room(self, rectangle, door_coord):
-        if self.rectangle_consists_of_tiles(rectangle, (self.W, self.R)):
+        if self.rectangle_is_impassable(rectangle):
             self.make_room(rectangle)
             self.level.tiles[door_coord] = self.F
             return True
@@ -197,7 +206,7 @@ class RDG(object):
 
     def free_coord(self):
         while True:
-            coord = self.level.tiles.random_coord()
+            coord = self.level.tiles.random_coord(self.random)
             if self.level.tiles[coord] == self.F:
                 return coord
 
@@ -206,7 +215,7 @@ class RDG(object):
             self.wall_coords_cache = tuple(self.wall_coords)
             self.is_wall_coords_dirty = False
 
-        return choice(self.wall_coords_cache)
+        return self.random.choice(self.wall_coords_cache)
 
     def mark_wall(self, coord):
         if coord in self.wall_coords:
@@ -232,49 +241,60 @@ class RDG(object):
             return False
 
         neighbors = self.get_up_down_left_right_neighbors(coord)
-        dir_map = {(self.R, self.F, self.W, self.W): Dir.North,
-                   (self.F, self.R, self.W, self.W): Dir.South,
-                   (self.W, self.W, self.R, self.F): Dir.West,
-                   (self.W, self.W, self.F, self.R): Dir.East}
-        try:
-            return dir_map[neighbors]
-        except KeyError:
-            return False
+        return self.edge_directions.get(neighbors, False)
 
     def get_up_down_left_right_neighbors(self, coord):
-        tiles = self.level.tiles
+        """Return the tile ids of the orthogonal neighbors of coord."""
+        ids = self.level.tiles.ids
         neighbors = (
-            tiles[add_vector(coord, Dir.North)],
-            tiles[add_vector(coord, Dir.South)],
-            tiles[add_vector(coord, Dir.West)],
-            tiles[add_vector(coord, Dir.East)],
+            ids[add_vector(coord, Dir.North)],
+            ids[add_vector(coord, Dir.South)],
+            ids[add_vector(coord, Dir.West)],
+            ids[add_vector(coord, Dir.East)],
         )
         return neighbors
 
     def make_room(self, rectangle):
         y_start, x_start, y_limit, x_limit = rectangle
 
+        self.level.tiles.fill_rectangle(rectangle, self.W)
+        if y_limit - y_start > 2 and x_limit - x_start > 2:
+            self.level.tiles.fill_rectangle(Rectangle(y_start + 1, x_start + 1, y_limit - y_start - 2,
+                                                      x_limit - x_start - 2), self.F)
+
         for y in range(y_start, y_limit):
             for x in range(x_start, x_limit):
                 if y in (y_start, y_limit - 1) or x in (x_start, x_limit - 1):
-                    self.level.tiles[y, x] = self.W
                     self.mark_wall((y, x))
-                else:
-                    self.level.tiles[y, x] = self.F
 
     def rectangle_consists_of_tiles(self, rectangle, tile_seq):
-        tiles = self.level.tiles
-        return all(tiles.is_legal(coord) and tiles[coord] in tile_seq for coord in rectangle.iterate())
+        return self.level.tiles.rectangle_consists_of(rectangle, tile_seq)
+
+    def rectangle_is_impassable(self, rectangle):
+        """
+        Return True if rectangle is inside the level and has only impassable tiles.
+
+        Walls and rock are the only impassable tiles the generator lays so this is
+        rectangle_consists_of_tiles(rectangle, (self.W, self.R)) read from the
+        passable plane a row slice at a time.
+        """
+        y_start, x_start, y_limit, x_limit = rectangle
+        if y_start < 0 or x_start < 0 or y_limit > self.rows or x_limit > self.cols:
+            return False
+
+        passable = self.level.tiles.passable
+        cols = self.cols
+        for y in range(y_start, y_limit):
+            if any(passable[y * cols + x_start:y * cols + x_limit]):
+                return False
+        return True
 
     def set_rectangle(self, rectangle, tile):
         """Set all the tiles in rectangle to given tile."""
+        self.level.tiles.fill_rectangle(rectangle, tile)
         if tile == self.W:
             for coord in rectangle.iterate():
-                self.level.tiles[coord] = tile
                 self.mark_wall(coord)
-        else:
-            for coord in rectangle.iterate():
-                self.level.tiles[coord] = tile
 
     def turn_rock_to_wall(self):
         for coord, tile in self.level.tiles.enumerate():
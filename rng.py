@@ -0,0 +1,26 @@
+"""
+Seed hierarchy for reproducible randomness.
+
+A world seed derives a seed for every dungeon, a dungeon seed one for every
+level of it and a level seed one independent Random stream for every subsystem
+using randomness on the level. Derived seeds only depend on their parent seed
+and the key so they are the same regardless of the order or the process they
+are derived in.
+"""
+import random
+from random import Random
+
+
+def derive_seed(seed, *keys):
+    """Return a 64-bit seed derived from seed and keys."""
+    return Random(":".join(str(part) for part in (seed,) + keys)).getrandbits(64)
+
+
+def get_stream(seed, name):
+    """Return a Random stream of the subsystem name under seed."""
+    return Random(derive_seed(seed, name))
+
+
+def new_seed():
+    """Return an unpredictable seed for when no seed has been given."""
+    return random.getrandbits(64)
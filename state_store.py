@@ -1,31 +1,333 @@
+"""
+Saving and loading of games.
+
+A save file consists of separately compressed chunks: one for the game without
+its levels and one for each level. An index at the end of the file tells where
+the chunks are. Loading only reads the game chunk and leaves the levels to be
+decompressed when the world first asks for them. Saving copies the chunks of
+levels that haven't been loaded as they are. Loaded levels are pickled and their
+old chunk is reused if the pickle didn't change since the last save.
+
+File layout: header (magic, codec name, index offset), chunks, pickled index.
+All chunks of a file are compressed with the codec named in the header and
+independent chunks are compressed in parallel in a thread pool.
+
+References between chunks are pickled as persistent ids: levels are referred to
+by their level keys and creatures living on a level by their level key and
+coordinate. That way the game chunk doesn't contain the levels and a creature
+is only stored in the chunk of the level it is on.
+"""
 import bz2
+import hashlib
+import io
+import lzma
 import os
 import pickle
+import struct
+import threading
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from config.game import GameConf
+from creature import Creature
+from instrumentation import timed
+from world.level import Level
+from world.world import LevelMapping
 
 
 _SAVE_FILETYPE = ".svg"
+_MAGIC = b"PYRLSAV3"
+_HEADER = struct.Struct("<8s8sQ")
+_GAME_CHUNK = "game"
+
+# Held while reading chunks and while replacing a save file
+_file_lock = threading.Lock()
 
+ChunkInfo = namedtuple("ChunkInfo", ("offset", "size", "raw_size", "digest"))
+Codec = namedtuple("Codec", ("compress", "decompress"))
 
+# compress(data, level) -> bytes, decompress(data) -> bytes
+codecs = {
+    "none": Codec(lambda data, level: data, lambda data: data),
+    "zlib": Codec(zlib.compress, zlib.decompress),
+    "bz2":  Codec(bz2.compress, bz2.decompress),
+    "lzma": Codec(lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+
+@timed("save.load")
 def load(save_name):
-    save_path = os.path.join(GameConf.save_folder, save_name + _SAVE_FILETYPE)
+    save_path = _get_save_path(save_name)
     with open(save_path, "rb") as f:
-        state_string = f.read()
-    return pickle.loads(bz2.decompress(state_string))
+        header = f.read(_HEADER.size)
+        if not header.startswith(_MAGIC) or len(header) < _HEADER.size:
+            raise pickle.UnpicklingError("Not a save file: {}".format(save_path))
+        _, codec_name, index_offset = _HEADER.unpack(header)
+        codec_name = codec_name.rstrip(b"\0").decode()
+        f.seek(index_offset)
+        index = pickle.load(f)
+
+    save_file = SaveFile(save_path, index, codec_name)
+    save_file.levels = LevelMapping(unloaded=(key for key in index if key != _GAME_CHUNK), source=save_file)
+    return save_file.load_chunk(_GAME_CHUNK)
+
+
+def save(game, save_name, codec_name=None):
+    """
+    Save game, return the uncompressed and the compressed size of the save.
+
+    codec_name defaults to GameConf.save_codec.
+    """
+    return write_snapshot(take_snapshot(game, codec_name), save_name)
+
+
+Snapshot = namedtuple("Snapshot", ("levels", "previous", "codec_name", "chunks"))
+
+
+@timed("save.snapshot")
+def take_snapshot(game, codec_name=None):
+    """
+    Return a consistent snapshot of game to be written with write_snapshot.
+
+    The loaded levels and the game are pickled to bytes so the game can go on
+    while the snapshot is written. Unloaded levels are taken from the previous
+    save as they are.
+    """
+    if codec_name is None:
+        codec_name = GameConf.save_codec
+    levels = game.world.levels
+    previous = levels.source if isinstance(levels.source, SaveFile) else None
+    level_keys = {id(level): level_key for level_key, level in levels.loaded.items()}
 
+    chunks = []
+    for level_key in levels.unloaded:
+        chunks.append((level_key, None))
+    for level_key, level in levels.loaded.items():
+        chunks.append((level_key, _dumps(level, levels, level_keys)))
+    chunks.append((_GAME_CHUNK, _dumps(game, levels, level_keys)))
+    return Snapshot(levels, previous, codec_name, chunks)
 
-def save(obj, save_name):
+
+@timed("save.write")
+def write_snapshot(snapshot, save_name):
+    """
+    Compress and write snapshot, return the uncompressed and the compressed size.
+
+    Can be called from another thread than the one that took the snapshot. The
+    save is written to a temporary file which replaces the old save only when
+    complete so a failed save never leaves a truncated save file behind.
+    """
     if not os.path.exists(GameConf.save_folder):
-        os.mkdir(GameConf.save_folder)
+        os.makedirs(GameConf.save_folder, exist_ok=True)
+
+    levels, previous, codec_name, chunks = snapshot
+    codec, level = codecs[codec_name], GameConf.save_compression_level
+    compress = lambda data: codec.compress(data, level)
+    threads = GameConf.save_compression_threads or os.cpu_count() or 1
+    # Most chunks compressed ahead of the one being written
+    window = 2 * threads
+
+    if previous is not None and previous.codec_name != codec_name:
+        previous_chunk = partial(_transcode_chunk, previous, compress)
+    else:
+        previous_chunk = previous.copy_chunk if previous is not None else None
+
+    def get_chunk(key, raw):
+        if raw is None:
+            return previous_chunk(key)
+        digest = hashlib.sha1(raw).digest()
+        if previous is not None and key in previous.index and previous.index[key].digest == digest:
+            return previous_chunk(key)
+        return _new_chunk(raw, digest, compress)
+
+    save_path = _get_save_path(save_name)
+    temp_path = save_path + ".tmp"
+    index = {}
+    try:
+        with open(temp_path, "wb") as f, ThreadPoolExecutor(threads) as executor:
+            f.write(_HEADER.pack(_MAGIC, codec_name.encode(), 0))
+
+            def write_chunk(key, future):
+                info, compressed = future.result()
+                index[key] = info._replace(offset=f.tell())
+                f.write(compressed)
 
-    save_path = os.path.join(GameConf.save_folder, save_name + _SAVE_FILETYPE)
-    state_string = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
-    compressed_state = bz2.compress(state_string, GameConf.save_compression_level)
-    with open(save_path, "wb") as f:
-        f.write(compressed_state)
+            # Chunks are compressed in the executor and written in order
+            in_flight = deque()
+            for key, raw in chunks:
+                in_flight.append((key, executor.submit(get_chunk, key, raw)))
+                if len(in_flight) > window:
+                    write_chunk(*in_flight.popleft())
+            while in_flight:
+                write_chunk(*in_flight.popleft())
+
+            index_offset = f.tell()
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, codec_name.encode(), index_offset))
+            f.flush()
+            os.fsync(f.fileno())
+
+        save_file = SaveFile(save_path, index, codec_name)
+        save_file.levels = levels
+        with _file_lock:
+            os.replace(temp_path, save_path)
+            if previous is not None:
+                previous.replaced_by = save_file
+            levels.source = save_file
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
     save_size = os.path.getsize(save_path)
-    uncompressed = len(state_string)
+    uncompressed = sum(info.raw_size for info in index.values())
 
     return uncompressed, save_size
+
+
+class SaveFile(object):
+
+    """Chunked save file on disk. Chunks are read by the index when asked for."""
+
+    def __init__(self, path, index, codec_name):
+        self.path = path
+        self.index = index
+        self.codec_name = codec_name
+        self.levels = None
+        # The save file written over this one. The chunks are read from it instead.
+        self.replaced_by = None
+        self._loading = set()
+
+    decompress = property(lambda self: codecs[self.codec_name].decompress)
+
+    def read_chunk(self, key):
+        with _file_lock:
+            save_file = self
+            while save_file.replaced_by is not None:
+                save_file = save_file.replaced_by
+            info = save_file.index[key]
+            with open(save_file.path, "rb") as f:
+                f.seek(info.offset)
+                return f.read(info.size)
+
+    def copy_chunk(self, key):
+        """Return the chunk info and the compressed data of the chunk as is."""
+        return self.index[key], self.read_chunk(key)
+
+    def load_chunk(self, key):
+        assert key not in self._loading, "Circular reference between save chunks: {}".format(key)
+        self._loading.add(key)
+        try:
+            raw = self.decompress(self.read_chunk(key))
+            return _Unpickler(io.BytesIO(raw), self.levels).load()
+        finally:
+            self._loading.discard(key)
+
+    @timed("save.load_level")
+    def load_level(self, level_key):
+        return self.load_chunk(level_key)
+
+
+class BackgroundSaver(object):
+
+    """
+    Writes game snapshots in a worker thread.
+
+    The snapshot is taken in the calling thread so it should be started at a
+    point where the game state is consistent, eg. between turns. Only one save
+    is written at a time.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+    def is_saving(self):
+        return self.future is not None and not self.future.done()
+
+    def start(self, game, save_name, codec_name=None):
+        """Snapshot game and start writing it, return False if a save is still being written."""
+        if self.is_saving():
+            return False
+        snapshot = take_snapshot(game, codec_name)
+        self.future = self.executor.submit(write_snapshot, snapshot, save_name)
+        return True
+
+    def poll(self):
+        """Return the future of a finished save once, otherwise None."""
+        if self.future is not None and self.future.done():
+            future, self.future = self.future, None
+            return future
+        return None
+
+    def wait(self):
+        """Wait for the save being written, return its future or None if there was none."""
+        if self.future is not None:
+            self.future.exception()
+        return self.poll()
+
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file, levels, level_keys, root):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.levels = levels
+        self.level_keys = level_keys
+        self.root = root
+
+    def persistent_id(self, obj):
+        if obj is self.root:
+            return None
+        elif obj is self.levels:
+            return ("levels",)
+        elif isinstance(obj, Level):
+            if id(obj) in self.level_keys:
+                return ("level", self.level_keys[id(obj)])
+        elif isinstance(obj, Creature):
+            level = obj.level
+            if (level is not None and level is not self.root and id(level) in self.level_keys
+                    and level.creatures.get(obj.coord) is obj):
+                return ("creature", self.level_keys[id(level)], obj.coord)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, levels):
+        super().__init__(file)
+        self.levels = levels
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == "levels":
+            return self.levels
+        elif kind == "level":
+            return self.levels[pid[1]]
+        elif kind == "creature":
+            return self.levels[pid[1]].creatures[pid[2]]
+        else:
+            raise pickle.UnpicklingError("Unknown persistent id: {}".format(pid))
+
+
+def _dumps(obj, levels, level_keys):
+    f = io.BytesIO()
+    _Pickler(f, levels, level_keys, obj).dump(obj)
+    return f.getvalue()
+
+
+def _new_chunk(raw, digest, compress):
+    """Return the chunk info and compressed data of raw."""
+    compressed = compress(raw)
+    return ChunkInfo(0, len(compressed), len(raw), digest), compressed
+
+
+def _transcode_chunk(save_file, compress, key):
+    """Return a chunk of save_file recompressed with compress."""
+    return _new_chunk(save_file.decompress(save_file.read_chunk(key)), save_file.index[key].digest, compress)
+
+
+def _get_save_path(save_name):
+    return os.path.join(GameConf.save_folder, save_name + _SAVE_FILETYPE)
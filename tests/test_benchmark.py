@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from config.game import GameConf
+from tools import benchmark
+
+
+@pytest.fixture(autouse=True)
+def save_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(GameConf, "save_folder", str(tmp_path / "save_data"))
+    return tmp_path / "save_data"
+
+
+def test_run_and_compare(tmpdir):
+    results = benchmark.run("bresenham_line[length=10]", rounds=2, min_round_time=0.001)
+    assert list(results["results"]) == ["bresenham_line[length=10]"]
+    stats = results["results"]["bresenham_line[length=10]"]
+    assert stats["params"] == {"length": 10}
+    assert 0 < stats["min"] <= stats["median"]
+
+    results_path = benchmark.save_results(results, str(tmpdir.join("results.json")))
+    baseline = benchmark.load_results(results_path)
+    assert json.loads(json.dumps(results)) == baseline
+
+    baseline["results"]["bresenham_line[length=10]"]["median"] = stats["median"] / 2
+    comparisons = benchmark.compare(baseline, results)
+    assert [case for case, old, new, change in comparisons] == ["bresenham_line[length=10]"]
+    assert benchmark.get_regressions(comparisons, threshold=0.5) == comparisons
+    assert benchmark.get_regressions(comparisons, threshold=1.5) == []
+
+
+def test_cases_cover_parameter_grid():
+    cases = [case for case, setup, params in benchmark.get_cases("turn_scheduler[")]
+    assert cases == ["turn_scheduler[creature_count={}]".format(count) for count in benchmark.CREATURE_COUNTS]
+
+
+def test_main_writes_results_to_folder(tmp_path, save_folder):
+    folder = tmp_path / "output"
+    assert benchmark.main(["-k", "bresenham_line[length=10]", "--rounds", "1", "--folder", str(folder)]) == 0
+    assert len(os.listdir(str(folder / benchmark.RESULTS_SUBFOLDER))) == 1
+    assert not save_folder.exists()
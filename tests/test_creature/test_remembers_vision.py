@@ -0,0 +1,29 @@
+from game_data.player import Player
+from generic_structures import CoordBitmap
+from tests.test_level import get_level
+
+
+def test_visited_locations_bitmap():
+    player = Player()
+    level = get_level()
+    level.finalize("test")
+    level.spawn_creature(player)
+
+    player.vision = frozenset({(1, 1), (1, 2)})
+    player.vision = frozenset({(1, 2), (2, 2)})
+    visited = player.get_visited_locations()
+    assert isinstance(visited, CoordBitmap)
+    assert visited == {(1, 1), (1, 2), (2, 2)}
+
+
+
+def test_vision_from_light_bitmap():
+    player = Player()
+    level = get_level()
+    level.finalize("test")
+    level.spawn_creature(player)
+
+    light_set = level.get_light_set(player.coord, player.sight)
+    player.set_vision(light_set, level.get_light_bitmap(player.coord, player.sight))
+    assert player.vision is light_set
+    assert player.get_visited_locations() == light_set
@@ -0,0 +1,53 @@
+import random
+
+import fov
+from generic_structures import Array2D
+from rdg import generate_tiles_to
+from world.level import Level
+
+
+def get_level():
+    level = Level(tiles=Array2D((26, 96)))
+    generate_tiles_to(level)
+    return level
+
+
+def test_symmetric_shadowcast_is_symmetric():
+    random.seed(1)
+    level = get_level()
+    see_through = level.tiles.see_through
+    rows, cols = level.tiles.dimensions
+    get_light_set = fov.SymmetricShadowCast.get_light_set_from_plane
+
+    for _ in range(20):
+        origin = level.free_coord()
+        light_set = get_light_set(see_through, origin, 10, rows, cols)
+        assert origin in light_set
+        for coord in light_set:
+            if level.is_see_through(coord):
+                assert origin in get_light_set(see_through, coord, 10, rows, cols)
+
+
+def test_light_mask_matches_light_set():
+    random.seed(2)
+    level = get_level()
+    see_through = level.tiles.see_through
+    rows, cols = level.tiles.dimensions
+
+    origin = level.free_coord()
+    mask = fov.SymmetricShadowCast.get_light_mask(see_through, origin, 8, rows, cols)
+    light_set = fov.SymmetricShadowCast.get_light_set_from_plane(see_through, origin, 8, rows, cols)
+    assert light_set == {coord for coord in level.tiles.coord_iter() if mask[level.tiles.get_index(coord)]}
+
+
+def test_algorithms_stay_inside_the_level():
+    random.seed(3)
+    level = get_level()
+    see_through = level.tiles.see_through
+    rows, cols = level.tiles.dimensions
+    corner = (1, 1)
+
+    for algorithm in fov.algorithms.values():
+        light_set = algorithm.get_light_set_from_plane(see_through, corner, 40, rows, cols)
+        assert corner in light_set
+        assert all(level.is_legal(coord) for coord in light_set)
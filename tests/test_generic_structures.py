@@ -1,6 +1,9 @@
+import pickle
+import random
+
 import pytest
 
-from generic_structures import Array2D, Event, OneToOneMapping
+from generic_structures import Array2D, CoordBitmap, Event, OneToOneMapping, SpatialIndex, TypedGrid
 
 
 def test_Array2D():
@@ -20,6 +23,95 @@ def test_Array2D():
     assert not l.is_legal((3, 2))
 
 
+def test_TypedGrid():
+    dims = 3, 4
+    grid = TypedGrid(dims, (1, 2, 3))
+    assert grid.dimensions == dims
+    assert len(grid) == 12
+    assert grid[0, 2] == 3
+    assert grid[2, 3] == 0
+    assert list(grid[0, 1:3]) == [2, 3]
+
+    grid[1, 1] = 5
+    assert grid[grid.get_coord(5)] == 5
+    grid[2, 0:2] = (7, 8)
+    assert list(grid.row_view(2)) == [7, 8, 0, 0]
+
+    row = grid.row_view(0)
+    grid[0, 0] = 9
+    assert row[0] == 9
+
+    grid.fill_rectangle((1, 2, 3, 4), 4)
+    assert list(grid) == [9, 2, 3, 0,
+                          0, 5, 4, 4,
+                          7, 8, 4, 4]
+    assert grid.rectangle_in_set((1, 2, 3, 4), {4})
+    assert grid.rectangle_in_set((0, 0, 1, 3), {9, 2, 3})
+    assert not grid.rectangle_in_set((0, 0, 2, 3), {9, 2, 3})
+    assert not grid.rectangle_in_set((1, 2, 4, 4), {4})
+
+    assert not grid.is_legal((3, 0))
+    assert grid == TypedGrid(dims, list(grid))
+
+
+def test_CoordBitmap():
+    dims = 3, 10
+    coords = {(0, 0), (1, 9), (2, 3)}
+    bitmap = CoordBitmap(dims, coords)
+    assert bitmap == coords
+    assert len(bitmap) == 3
+    assert (1, 9) in bitmap
+    assert (1, 8) not in bitmap
+    assert (3, 0) not in bitmap
+    assert bitmap | {(2, 2)} == coords | {(2, 2)}
+
+    other = CoordBitmap(dims, [(2, 2), (0, 0)])
+    bitmap |= other
+    assert bitmap == coords | {(2, 2)}
+
+    # Only the given rows of the other bitmap are added
+    bitmap.update_rows(CoordBitmap(dims, [(0, 5), (1, 5), (2, 5)]), 1, 2)
+    assert bitmap == coords | {(2, 2), (1, 5)}
+
+    loaded = pickle.loads(pickle.dumps(bitmap))
+    assert loaded.dimensions == dims
+    assert loaded == bitmap
+
+
+def test_SpatialIndex():
+    rng = random.Random(0)
+    coords = {(rng.randrange(-20, 60), rng.randrange(-20, 60)) for _ in range(300)}
+    index = SpatialIndex(coords, bucket_size=4)
+    assert index == coords and len(index) == len(coords)
+
+    moved = next(iter(coords))
+    index.move(moved, (100, 100))
+    coords.remove(moved)
+    coords.add((100, 100))
+    index.discard((-100, -100))
+    assert index == coords and (100, 100) in index and moved not in index
+
+    def distance(a, b):
+        return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+    for center in [(rng.randrange(-30, 110), rng.randrange(-30, 110)) for _ in range(50)]:
+        radius = rng.randrange(0, 20)
+        assert set(index.in_radius(center, radius)) == {c for c in coords if distance(c, center) <= radius ** 2}
+        rectangle = center + (center[0] + radius, center[1] + 2 * radius)
+        assert set(index.in_rectangle(rectangle)) == {(y, x) for y, x in coords
+                                                       if center[0] <= y < rectangle[2] and center[1] <= x < rectangle[3]}
+        nearest = index.nearest(center, exclude={center})
+        assert distance(nearest, center) == min(distance(c, center) for c in coords if c != center)
+        limited = index.nearest(center, max_radius=radius)
+        in_range = [c for c in coords if distance(c, center) <= radius ** 2]
+        if in_range:
+            assert distance(limited, center) == min(distance(c, center) for c in in_range)
+        else:
+            assert limited is None
+
+    assert SpatialIndex().nearest((0, 0)) is None
+
+
 def test_one_to_one_mapping():
     mapping = OneToOneMapping()
     mapping[0] = 0
@@ -52,6 +144,44 @@ def test_one_to_one_mapping():
         mapping.update({"a": 10, "b": 10})
 
 
+def test_one_to_one_mapping_inverse():
+    mapping = OneToOneMapping({"a": 1, "b": 2}, c=3)
+    assert mapping.getkey(3) == "c" and mapping.has_value(1)
+
+    mapping["a"] = 4
+    assert not mapping.has_value(1) and mapping.getkey(4) == "a"
+    mapping["a"] = 4
+    with pytest.raises(ValueError):
+        OneToOneMapping([("a", 1), ("b", 1)])
+
+    assert mapping.pop("b") == 2 and not mapping.has_value(2)
+    assert mapping.pop("b", None) is None
+    mapping.setdefault("d", 5)
+    assert mapping.getkey(5) == "d"
+    key, value = mapping.popitem()
+    assert not mapping.has_value(value)
+
+    copied = mapping.copy()
+    loaded = pickle.loads(pickle.dumps(mapping))
+    for other in (copied, loaded):
+        assert type(other) is OneToOneMapping and other == mapping
+        assert all(other.getkey(value) == key for key, value in mapping.items())
+
+    merged = mapping | {"e": 6}
+    assert type(merged) is OneToOneMapping and merged.getkey(6) == "e" and not mapping.has_value(6)
+    mapping |= {"f": 7}
+    assert mapping.getkey(7) == "f"
+    with pytest.raises(ValueError):
+        mapping |= {"g": 7}
+    with pytest.raises(ValueError):
+        mapping | {"g": 7}
+
+    mapping.clear()
+    assert not mapping.has_value(3)
+    with pytest.raises(KeyError):
+        mapping.getkey(3)
+
+
 def test_observable_event():
     event = Event()
     sub1 = None
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import path
+from game_data.levels.shared_assets import construct_data
+from game_data.tiles import PyrlTile
+from generic_structures import Array2D
+from enums.level_gen import LevelGen
+from world.level import Level
+from world.world import LevelKey
+
+
+def get_generated_level(dimensions=(40, 60), seed=1):
+    level = Level(danger_level=1, tiles=Array2D(dimensions), creature_spawning=False, seed=seed)
+    level.finalize(LevelKey("dungeon", 1))
+    return level
+
+
+def get_walled_level():
+    # A wall splits the level to two with a gap at the bottom
+    rows = ["w" * 30]
+    rows += ["w" + "." * 14 + "w" + "." * 13 + "w"] * 17
+    rows += ["w" + "." * 28 + "w"]
+    rows += ["w" * 30]
+    tiles, _, _ = construct_data((20, 30), "".join(rows), {}, {}, {})
+    return Level(generation_type=LevelGen.NoGeneration, tiles=tiles, creature_spawning=False)
+
+
+def get_cost(level, start, coords):
+    cost = 0
+    for origin, target in zip([start] + coords, coords):
+        cost += dict(level.get_neighbor_location_coords_and_costs(origin))[target]
+    return cost
+
+
+def test_paths_are_valid_and_near_optimal():
+    level = get_generated_level()
+    coords = [coord for coord in level.tiles.coord_iter() if level.is_pathable(coord)]
+    rng = random.Random(0)
+    for _ in range(20):
+        start, goal = rng.sample(coords, 2)
+        try:
+            flat = list(path.path(start, goal, level.get_neighbor_location_coords_and_costs,
+                                  level._a_star_heuristic))
+        except path.PathException:
+            flat = None
+        try:
+            hierarchical = level.path(start, goal)
+        except path.PathException:
+            hierarchical = None
+
+        assert (flat is None) == (hierarchical is None)
+        if flat is not None:
+            assert hierarchical[-1] == goal
+            assert get_cost(level, start, hierarchical) <= 1.5 * get_cost(level, start, flat)
+
+
+def test_tile_changes_rebuild_only_the_affected_clusters():
+    level = get_walled_level()
+    start, goal = (1, 1), (1, 28)
+    assert (18, 15) in level.path(start, goal)
+    graph = level.cluster_graph
+    untouched_edges = graph.intra_edges[0, 0]
+
+    level.tiles[18, 15] = PyrlTile.Wall
+    assert graph.dirty == {(1, 1)}
+    with pytest.raises(path.PathException):
+        level.path(start, goal)
+    assert graph.intra_edges[0, 0] is untouched_edges
+
+    level.tiles[1, 15] = PyrlTile.Floor
+    assert level.path(start, goal) == [(1, x) for x in range(2, 29)]
@@ -0,0 +1,50 @@
+from instrumentation import Instruments
+
+
+instruments = Instruments()
+
+
+@instruments.timed("test.func")
+def func(value):
+    return value * 2
+
+
+class Timed(object):
+
+    @instruments.timed("other.method")
+    def method(self):
+        instruments.count("other.counter", 2)
+
+
+def test_disabled_instruments_leave_functions_as_is():
+    original = Timed.__dict__["method"]
+    instruments.enabled = True
+    assert Timed.__dict__["method"] is not original
+    instruments.enabled = False
+    assert Timed.__dict__["method"] is original
+    assert func(2) == 4
+    Timed().method()
+    assert not instruments.timers
+    assert not instruments.counters
+
+
+def test_timers_and_counters():
+    instruments.reset()
+    instruments.enabled = True
+    try:
+        for _ in range(3):
+            assert func(2) == 4
+        Timed().method()
+    finally:
+        instruments.enabled = False
+
+    calls, total, longest = instruments.timers["test.func"]
+    assert calls == 3 and 0 <= longest <= total
+    assert instruments.counters["other.counter"] == 2
+    assert list(instruments.get_subsystem_totals()) == ["other", "test"]
+    assert instruments.get_subsystem_totals()["test"][0] == 3
+    report = "\n".join(instruments.get_report_lines())
+    assert "test.func" in report and "other.counter" in report
+
+    instruments.reset()
+    assert not instruments.timers
@@ -0,0 +1,124 @@
+import pickle
+
+import pytest
+
+from config.game import GameConf
+from enums.directions import Dir
+from fov import ShadowCast
+from game_actions import Action
+from game_data.levels.shared_assets import construct_data
+from game_data.tiles import PyrlTile
+from enums.level_gen import LevelGen
+from world.level import Level
+
+
+TEST_DIMENSIONS = (7, 9)
+
+
+def get_level():
+    tiles, _, _ = construct_data(
+        TEST_DIMENSIONS,
+        "wwwwwwwww"
+        "w.......w"
+        "w.......w"
+        "w...w...w"
+        "w.......w"
+        "w.......w"
+        "wwwwwwwww",
+        {}, {}, {},
+    )
+    return Level(generation_type=LevelGen.NoGeneration, tiles=tiles, creature_spawning=False)
+
+
+def test_light_set_cache():
+    level = get_level()
+    coord = (3, 2)
+    light_set = level.get_light_set(coord, 5)
+    expected = ShadowCast.get_light_set(level.is_see_through, coord, 5, *TEST_DIMENSIONS)
+    assert light_set == expected
+    assert level.get_light_set(coord, 5) is light_set
+
+    assert (3, 6) not in light_set
+    level.tiles[3, 4] = PyrlTile.Floor
+    new_light_set = level.get_light_set(coord, 5)
+    assert new_light_set is not light_set
+    assert (3, 6) in new_light_set
+
+    # Changing a tile without changing transparency keeps the cache
+    level.tiles[1, 1] = PyrlTile.Black_Floor
+    assert level.get_light_set(coord, 5) is new_light_set
+
+
+@pytest.mark.parametrize("fov_algorithm", ["shadowcast", "symmetric_shadowcast"])
+def test_light_bitmap(monkeypatch, fov_algorithm):
+    monkeypatch.setattr(GameConf, "fov_algorithm", fov_algorithm)
+    level = get_level()
+    bitmap = level.get_light_bitmap((3, 2), 5)
+    assert bitmap == level.get_light_set((3, 2), 5)
+    assert level.get_light_bitmap((3, 2), 5) is bitmap
+    level.tiles[3, 4] = PyrlTile.Floor
+    assert level.get_light_bitmap((3, 2), 5) == level.get_light_set((3, 2), 5) != bitmap
+
+
+def test_light_set_cache_is_not_pickled():
+    level = get_level()
+    level.get_light_set((3, 2), 5)
+    loaded = pickle.loads(pickle.dumps(level))
+    assert len(loaded._light_set_cache) == 0
+    assert loaded.get_light_set((3, 2), 5) == level.get_light_set((3, 2), 5)
+
+
+def test_los_set_matches_check_los():
+    level = get_level()
+    rows, cols = TEST_DIMENSIONS
+    sight = 5
+    for origin in ((1, 1), (3, 3), (5, 7)):
+        los_set = level.get_los_set(origin, sight)
+        for coord in ((y, x) for y in range(rows) for x in range(cols)):
+            in_distance = (origin[0] - coord[0]) ** 2 + (origin[1] - coord[1]) ** 2 <= sight ** 2
+            assert (coord in los_set) == (in_distance and level.check_los(coord, origin))
+
+
+def test_distance_map():
+    level = get_level()
+    goal = (3, 6)
+    distance_map = level.get_distance_map(goal)
+    assert distance_map[goal] == 0
+    assert (3, 4) not in distance_map
+    assert distance_map[3, 5] == Action.Move.base_cost
+    assert distance_map[3, 3] == distance_map[2, 4] + round(Dir.DiagonalMoveMult * Action.Move.base_cost)
+    assert level.get_distance_map(goal) is distance_map
+
+    level.tiles[3, 4] = PyrlTile.Floor
+    new_distance_map = level.get_distance_map(goal)
+    assert new_distance_map is not distance_map
+    assert new_distance_map[3, 3] == 3 * Action.Move.base_cost
+
+
+def test_spatial_indexes_follow_creatures_and_items():
+    from creature import Creature
+    level = get_level()
+    a, b = Creature("a", "a"), Creature("b", "b")
+    level.add_creature(a, (1, 1))
+    level.add_creature(b, (1, 2))
+    level.move_creature(a, (2, 1))
+    level.swap_creature(a, b)
+    assert set(level.creature_index) == set(level.creatures) == {(2, 1), (1, 2)}
+    assert set(level.get_creatures_in_radius((1, 1), 1)) == {a, b}
+    assert level.get_creatures_in_rectangle((2, 0, 3, 3)) == [b]
+    assert level.get_nearest_creature((3, 1)) is b
+    assert level.get_nearest_creature((3, 1), exclude=[b]) is a
+    assert level.get_nearest_creature((6, 6), max_radius=2) is None
+
+    level.remove_creature(b)
+    assert set(level.creature_index) == {(1, 2)}
+
+    for coord in ((1, 1), (1, 7), (5, 7)):
+        vision = level.get_light_set(coord, 3)
+        assert level.get_creature_coords_in_vision(coord, 3, vision) == vision & level.creatures.keys()
+
+    level.add_items((5, 5), ["item"])
+    assert level.get_item_coords_in_radius((4, 4), 2) == [(5, 5)]
+    assert set(pickle.loads(pickle.dumps(level)).item_index) == {(5, 5)}
+    level.pop_items((5, 5), [0])
+    assert not level.item_index
@@ -0,0 +1,76 @@
+import pickle
+
+from enums.colors import Pair
+from fov import ShadowCast
+from game_data.levels.shared_assets import construct_data
+from game_data.tiles import PyrlTile
+from world.level_tiles import LevelTiles
+from world.tile import Tile, tile_registry
+
+
+TEST_DIMENSIONS = (5, 6)
+
+
+def get_tiles():
+    tiles, _, _ = construct_data(
+        TEST_DIMENSIONS,
+        "wwwwww"
+        "w....w"
+        "w.w..w"
+        "w....w"
+        "wwwwww",
+        {}, {}, {},
+    )
+    return LevelTiles(tiles.dimensions, tiles)
+
+
+def test_planes_follow_tiles():
+    tiles = get_tiles()
+    for coord, tile in tiles.enumerate():
+        index = tiles.get_index(coord)
+        assert tiles.passable[index] == tile.is_passable
+        assert tiles.see_through[index] == tile.is_see_through
+        assert tiles.move_mult[index] == tile.movement_multiplier
+
+    tiles[2, 2] = PyrlTile.Floor
+    assert tiles.passable[tiles.get_index((2, 2))]
+    assert tiles.see_through[tiles.get_index((2, 2))]
+
+    tiles[1, 1] = PyrlTile.Wall
+    assert not tiles.passable[tiles.get_index((1, 1))]
+    assert not tiles.see_through[tiles.get_index((1, 1))]
+
+
+def test_pickling_rebuilds_planes():
+    tiles = get_tiles()
+    loaded = pickle.loads(pickle.dumps(tiles))
+    assert loaded == tiles
+    assert loaded.dimensions == tiles.dimensions
+    assert loaded.passable == tiles.passable
+    assert loaded.see_through == tiles.see_through
+    assert loaded.move_mult == tiles.move_mult
+
+
+def test_shadowcast_plane_matches_visibility_func():
+    tiles = get_tiles()
+    rows, cols = tiles.dimensions
+
+    def is_see_through(coord):
+        return tiles[coord].is_see_through
+
+    for coord in ((1, 1), (3, 4), (2, 3)):
+        from_func = ShadowCast.get_light_set(is_see_through, coord, 5, rows, cols)
+        from_plane = ShadowCast.get_light_set_from_plane(tiles.see_through, coord, 5, rows, cols)
+        assert from_func == from_plane
+
+
+def test_tiles_are_interned():
+    tile = Tile("dungeon floor", ('.', Pair.Light), ('.', Pair.Gray), True, True)
+    assert tile is PyrlTile.Floor
+    assert pickle.loads(pickle.dumps(PyrlTile.Wall)) is PyrlTile.Wall
+
+    tile_id = tile_registry.get_id(PyrlTile.Wall)
+    assert tile_registry.tiles[tile_id] is PyrlTile.Wall
+    assert tile_registry.passable[tile_id] == PyrlTile.Wall.is_passable
+    assert tile_registry.see_through[tile_id] == PyrlTile.Wall.is_see_through
+    assert tile_registry.get_id(None) == 0
@@ -0,0 +1,97 @@
+import pickle
+
+from enums.directions import Dir
+from game_data.player import Player
+from generic_algorithms import add_vector
+from generic_structures import Array2D
+from tests.test_level import get_level
+from world.level import Level
+from world.offscreen_simulation import OffscreenSimulator
+from world.world import LevelKey, LevelMapping, World
+
+
+def get_populated_level(creature_count=10):
+    level = get_level()
+    level.set_seed(0)
+    for _ in range(creature_count):
+        level.add_creature(Player())
+    return level
+
+
+def test_catch_up_moves_creatures_in_buckets():
+    level = get_populated_level()
+    simulator = OffscreenSimulator()
+    coords = set(level.creatures)
+
+    simulator.catch_up(level, 0)
+    assert level.simulated_time == 0
+
+    simulator.catch_up(level, 5 * simulator.bucket_time + 1)
+    assert level.simulated_time == 5 * simulator.bucket_time
+    assert set(level.creatures) != coords
+    assert len(level.creatures) == len(coords)
+    for coord, creature in level.creatures.items():
+        assert creature.coord == coord
+        assert level.is_pathable(coord)
+    assert set(level.creature_index) == set(level.creatures)
+
+
+def test_catch_up_spreads_creatures_on_a_generated_level():
+    level = Level(danger_level=1, tiles=Array2D((26, 96)), seed=1)
+    level.finalize(LevelKey("dungeon", 1))
+    start_coords = {creature: creature.coord for creature in level.creatures.values()}
+    ai_state = level.ai_random.getstate()
+    simulator = OffscreenSimulator()
+    level.simulated_time = 0
+
+    simulator.catch_up(level, simulator.max_catch_up_buckets * simulator.bucket_time)
+    distances = [max(abs(y - creature.coord[0]), abs(x - creature.coord[1]))
+                 for creature, (y, x) in start_coords.items()]
+    assert sum(distance > 0 for distance in distances) > 0.9 * len(distances)
+    assert sum(distances) / len(distances) > 3
+    # Creatures don't gather next to the walls
+    tile_share = _get_wall_adjacent_share(level, level.tiles.coord_iter())
+    assert _get_wall_adjacent_share(level, level.creatures) < tile_share + 0.15
+    assert level.ai_random.getstate() == ai_state
+
+
+def _get_wall_adjacent_share(level, coords):
+    pathable = [coord for coord in coords if level.is_pathable(coord)]
+    adjacent = [coord for coord in pathable
+                if any(not level.is_pathable(add_vector(coord, direction)) for direction in Dir.All)]
+    return len(adjacent) / len(pathable)
+
+
+def test_catch_up_skips_time_past_max_lag():
+    level = get_populated_level()
+    simulator = OffscreenSimulator()
+    level.simulated_time = 0
+    now = 10 * simulator.max_catch_up_buckets * simulator.bucket_time
+
+    buckets = []
+    simulator._simulate_bucket = buckets.append
+    simulator.catch_up(level, now)
+    assert len(buckets) == simulator.max_catch_up_buckets
+    assert level.simulated_time == now
+
+
+def test_step_advances_the_level_furthest_behind():
+    simulator = OffscreenSimulator(buckets_per_turn=2)
+    behind, ahead, active = get_populated_level(), get_populated_level(), get_populated_level()
+    behind.simulated_time, ahead.simulated_time = 0, 3 * simulator.bucket_time
+    for level in (behind, ahead, active):
+        level.is_finalized = True
+
+    world = World(Player())
+    world.levels = LevelMapping({1: ahead, 2: behind, 3: active})
+
+    simulator.step(world, active, 4 * simulator.bucket_time)
+    assert behind.simulated_time == 2 * simulator.bucket_time
+    assert ahead.simulated_time == 3 * simulator.bucket_time
+    assert active.simulated_time is None
+
+
+def test_simulated_time_is_pickled():
+    level = get_populated_level(0)
+    level.simulated_time = 1234
+    assert pickle.loads(pickle.dumps(level)).simulated_time == 1234
@@ -0,0 +1,32 @@
+import time
+
+from main import get_commandline_options
+from tools.sampling_profiler import SamplingProfiler
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profiler_writes_collapsed_stacks(tmpdir):
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    busy_loop(0.2)
+    profiler.stop()
+
+    assert any("test_sampling_profiler.py:busy_loop" in stack for stack in profiler.samples)
+
+    path = tmpdir.join("samples.collapsed")
+    profiler.write_collapsed(str(path))
+    for line in path.read().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.split(";")[-1]
+
+
+def test_profile_option():
+    assert get_commandline_options([]).profile is None
+    assert get_commandline_options(["-p"]).profile == "cprofile"
+    assert get_commandline_options(["--profile=sample"]).profile == "sample"
@@ -0,0 +1,18 @@
+from tools.simulate import new_headless_game, simulate
+
+
+def test_headless_simulation():
+    game = new_headless_game(seed=1)
+    assert game.world.level_pregenerator is None
+    draws = []
+    game.io.draw = lambda *args: draws.append(args)
+
+    result = simulate(game, 30, policy="explore")
+
+    assert game.turn_counter == 30
+    assert result.turns == 30
+    assert result.creature_actions > 0
+    assert result.subsystem_calls["fov"] > 0
+    assert result.subsystem_calls["scheduler"] > 0
+    assert not draws
+
@@ -0,0 +1,122 @@
+import os
+import pickle
+
+import pytest
+
+import state_store
+from bindings import Bind
+from config.game import GameConf
+from io_wrappers.mock import MockWrapper
+from tests.integration_test import prepare_input_and_run
+from world.world import LevelKey
+
+
+SAVE_NAME = "test_state_store"
+
+
+@pytest.fixture(autouse=True)
+def save_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(GameConf, "save_folder", str(tmp_path))
+
+
+def get_game():
+    import main
+    return main.prepare_game(MockWrapper, cmdline_args=("-g", SAVE_NAME))
+
+
+def test_levels_are_loaded_lazily():
+    game = prepare_input_and_run(get_game(), [Bind.Descend] * 2)
+    state_store.save(game, SAVE_NAME)
+
+    loaded = state_store.load(SAVE_NAME)
+    levels = loaded.world.levels
+    assert loaded.player.level.key == game.player.level.key
+    assert loaded.player.level is levels[game.player.level.key]
+    assert set(levels) == set(game.world.levels)
+    assert set(levels.loaded) < set(levels)
+
+    copied = pickle.loads(pickle.dumps(loaded.world)).levels
+    assert copied.unloaded == levels.unloaded
+
+    key = LevelKey("dungeon", 1)
+    assert key in levels.unloaded
+    assert list(levels[key].tiles) == list(game.world.levels[key].tiles)
+    assert key not in levels.unloaded
+    assert list(copied[key].tiles) == list(levels[key].tiles)
+
+
+def test_unchanged_levels_are_reused():
+    game = get_game()
+    state_store.save(game, SAVE_NAME)
+    first_index = game.world.levels.source.index
+
+    game = state_store.load(SAVE_NAME)
+    game.init_nonserializable_objects(MockWrapper)
+    game.world.levels[LevelKey("dungeon", 50)]
+    unloaded = set(game.world.levels.unloaded)
+    uncompressed, size = state_store.save(game, SAVE_NAME)
+    second_index = game.world.levels.source.index
+    assert set(first_index) == set(second_index)
+    for key in unloaded:
+        assert first_index[key].digest == second_index[key].digest
+    assert uncompressed > size
+
+    state_store.save(game, SAVE_NAME)
+    third_index = game.world.levels.source.index
+    assert second_index[LevelKey("dungeon", 50)] == third_index[LevelKey("dungeon", 50)]
+
+    loaded = state_store.load(SAVE_NAME)
+    assert loaded.player.level.key == game.player.level.key
+
+
+@pytest.mark.parametrize("codec_name", sorted(state_store.codecs))
+def test_codecs(codec_name):
+    original = get_game()
+    state_store.save(original, SAVE_NAME, "bz2")
+    game = state_store.load(SAVE_NAME)
+    game.init_nonserializable_objects(MockWrapper)
+    # The unloaded levels of the bz2 save are recompressed with the new codec
+    state_store.save(game, SAVE_NAME, codec_name)
+    assert game.world.levels.source.codec_name == codec_name
+
+    loaded = state_store.load(SAVE_NAME)
+    assert loaded.world.levels.source.codec_name == codec_name
+    key = LevelKey("dungeon", 3)
+    assert list(loaded.world.levels[key].tiles) == list(original.world.levels[key].tiles)
+
+
+def test_rejects_files_that_arent_saves():
+    with open(state_store._get_save_path(SAVE_NAME), "wb") as f:
+        f.write(b"not a save")
+    with pytest.raises(pickle.UnpicklingError):
+        state_store.load(SAVE_NAME)
+
+
+def test_background_save(monkeypatch):
+    monkeypatch.setattr(GameConf, "autosave_interval", 2)
+    save_path = state_store._get_save_path(SAVE_NAME)
+    assert not os.path.exists(save_path)
+
+    game = prepare_input_and_run(get_game(), [Bind.Descend] * 3)
+    game.background_saver.wait()
+    assert os.path.exists(save_path)
+    assert state_store.load(SAVE_NAME).turn_counter >= 2
+
+
+def test_failed_save_keeps_old_save(monkeypatch):
+    game = get_game()
+    state_store.save(game, SAVE_NAME)
+    save_path = state_store._get_save_path(SAVE_NAME)
+    with open(save_path, "rb") as f:
+        old_save = f.read()
+
+    def fail(fd):
+        raise IOError("Disk full")
+    monkeypatch.setattr(os, "fsync", fail)
+
+    saver = state_store.BackgroundSaver()
+    assert saver.start(game, SAVE_NAME)
+    assert isinstance(saver.wait().exception(), IOError)
+    with open(save_path, "rb") as f:
+        assert f.read() == old_save
+    assert not os.path.exists(save_path + ".tmp")
@@ -1,3 +1,5 @@
+import pickle
+
 from turn_scheduler import TurnScheduler
 
 
@@ -35,3 +37,71 @@ def test_turn_scheduler():
     ts.addpop("B", 1)
     assert ts.advance_time() == ("A", 0)
     ts.addpop("A", 1)
+
+
+def test_removed_event_can_be_added_back():
+    ts = TurnScheduler()
+    ts.add("A", 5)
+    ts.add("B", 10)
+    ts.remove("A")
+    ts.add("A", 20)
+    assert "A" in ts and len(ts) == 2
+    assert ts.advance_time() == ("B", 10)
+    ts.addpop("B", 100)
+    assert ts.advance_time() == ("A", 10)
+
+
+def test_compaction():
+    ts = TurnScheduler()
+    for event in range(1000):
+        ts.add(event, event)
+    for event in range(1000):
+        if event % 4:
+            ts.remove(event)
+    assert len(ts) == 250
+    assert len(ts.pq) < 1000
+    assert ts.removed_count <= len(ts.pq) * ts.compaction_ratio
+    assert ts.advance_time() == (0, 0)
+
+    small = TurnScheduler()
+    for event in range(small.compaction_min_size - 1):
+        small.add(event, event)
+    for event in range(1, small.compaction_min_size - 1):
+        small.remove(event)
+    # Heaps below compaction_min_size aren't compacted
+    assert len(small.pq) == small.compaction_min_size - 1
+
+    # Rescheduling an event with addpop can trigger the compaction too
+    ts = TurnScheduler()
+    for event in range(100):
+        ts.add(event, event)
+    for event in range(49, 99):
+        ts.remove(event)
+    assert ts.addpop(99, 1000) == (0, 0)
+    assert 0 not in ts and 99 in ts
+    assert sorted(entry[2] for entry in ts.pq) == list(range(1, 49)) + [99]
+    for event in range(1, 49):
+        assert ts.pop_due() == ([event], 1)
+    assert ts.pop_due() == ([99], 952)
+
+
+def test_pop_due():
+    ts = TurnScheduler()
+    for event in "ABC":
+        ts.add(event, 5)
+    ts.add("D", 7)
+    ts.remove("B")
+    assert ts.pop_due() == (["C", "A"], 5)
+    assert len(ts) == 1
+    assert ts.pop_due() == (["D"], 2)
+
+
+def test_pickling_drops_removed_entries():
+    ts = TurnScheduler()
+    ts.add("A", 1)
+    ts.add("B", 2)
+    ts.remove("A")
+    loaded = pickle.loads(pickle.dumps(ts))
+    assert len(loaded.pq) == 1 and loaded.removed_count == 0
+    assert loaded.advance_time() == ("B", 2)
+
@@ -0,0 +1,105 @@
+from enums.colors import Pair
+from window.window_system import WindowSystem
+
+
+class RecordingWindow(object):
+
+    implementation = "recording"
+
+    def __init__(self):
+        self.drawn = []
+        self.blits = 0
+
+    def draw(self, char_payload_sequence):
+        self.drawn.extend(char_payload_sequence)
+
+    def draw_str(self, string, coord, color=None):
+        pass
+
+    def clear(self):
+        pass
+
+    def blit(self, size, screen_position):
+        self.blits += 1
+
+
+class RecordingWrapper(object):
+
+    def new_window(self, dimensions):
+        return RecordingWindow()
+
+    def flush(self):
+        pass
+
+
+def get_level_window():
+    io = WindowSystem(RecordingWrapper())
+    io.refresh()
+    return io, io.level_window.cursor_win
+
+
+def test_level_window_draws_only_changes():
+    io, win = get_level_window()
+    wall, floor = ("#", Pair.Normal), (".", Pair.Normal)
+
+    io.draw([((0, 0), wall), ((0, 1), floor)])
+    io.refresh()
+    assert win.drawn == [((0, 0), wall), ((0, 1), floor)]
+    assert win.blits == 2
+
+    win.drawn.clear()
+    io.draw([((0, 0), wall), ((0, 1), wall)])
+    io.refresh()
+    assert win.drawn == [((0, 1), wall)]
+
+    io.draw([((0, 0), wall)])
+    io.refresh()
+    assert win.blits == 3
+
+
+def test_level_window_clear_blanks_undrawn_cells():
+    io, win = get_level_window()
+    wall = ("#", Pair.Normal)
+    io.draw([((0, 0), wall), ((0, 1), wall)])
+    io.refresh()
+
+    win.drawn.clear()
+    io.level_window.clear()
+    io.draw([((0, 0), wall)])
+    io.refresh()
+    assert win.drawn == [((0, 1), io.level_window.blank)]
+
+
+def test_whole_window_damages_other_windows():
+    io, win = get_level_window()
+    io.refresh()
+    blits = win.blits
+    io.whole_window.blit()
+    io.refresh()
+    assert win.blits == blits + 1
+
+
+def test_curses_draw_runs():
+    from io_wrappers.curses import get_runs
+    a, b = Pair.Normal, Pair.Red
+    cells = [((1, 0), ("c", a)), ((0, 1), ("b", a)), ((0, 0), ("a", a)), ((0, 2), ("d", b)),
+             ((0, 3), ("e", b)), ((1, 1), ("x", a)), ((1, 1), ("f", a))]
+    assert get_runs(cells) == [(0, 0, "ab", a), (0, 2, "de", b), (1, 0, "cf", a)]
+
+
+def test_status_bar_redraws_on_change():
+    io = WindowSystem(RecordingWrapper())
+    win = io.status_bar.cursor_win
+    value = [1]
+    io.status_bar.add_element("HP", lambda: value[0])
+    io.refresh()
+    io.refresh()
+    assert win.blits == 1
+
+    value[0] = 2
+    io.refresh()
+    assert win.blits == 2
+
+    io.invalidate()
+    io.refresh()
+    assert win.blits == 3
@@ -0,0 +1,107 @@
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from game_data.player import Player
+from world.level import Level
+from world.level_pregenerator import LevelPregenerator
+from world.world import World, LevelKey, LevelMapping
+
+
+def get_world(seed):
+    world = World(Player(), seed=seed)
+    for _ in range(3):
+        world.add_level("dungeon", Level())
+    return world
+
+
+def get_level_data(level):
+    return list(level.tiles), sorted((coord, creature.name) for coord, creature in level.creatures.items())
+
+
+def test_level_generation_is_seeded():
+    key = LevelKey("dungeon", 2)
+    first = get_level_data(get_world(1).get_level(key))
+    second = get_level_data(get_world(1).get_level(key))
+    assert first == second
+
+
+def test_pregenerated_level_matches_synchronous():
+    key = LevelKey("dungeon", 2)
+    expected = get_level_data(get_world(1).get_level(key))
+
+    world = get_world(1)
+    world.level_pregenerator = LevelPregenerator()
+    try:
+        world.pregenerate_adjacent_levels(LevelKey("dungeon", 1))
+        assert key in world.level_pregenerator
+        level = world.get_level(key)
+        assert level.is_finalized
+        assert world.levels[key] is level
+        assert key not in world.level_pregenerator
+        assert get_level_data(level) == expected
+    finally:
+        world.level_pregenerator.shutdown()
+
+
+def test_pregenerator_shutdown_cancels_queued_levels():
+    pregenerator = LevelPregenerator()
+    pregenerator.executor = ProcessPoolExecutor(max_workers=1)
+    futures = [pregenerator.executor.submit(time.sleep, 0.5) for _ in range(4)]
+    for i, future in enumerate(futures):
+        pregenerator.pending[LevelKey("dungeon", i)] = future
+    while not futures[0].running():
+        time.sleep(0.01)
+
+    start = time.perf_counter()
+    pregenerator.shutdown()
+    assert time.perf_counter() - start < 0.5
+    assert futures[-1].cancelled()
+    assert not pregenerator.pending and pregenerator.executor is None
+
+
+def test_pregenerator_is_not_pickled():
+    world = get_world(1)
+    world.level_pregenerator = LevelPregenerator()
+    loaded = pickle.loads(pickle.dumps(world))
+    assert loaded.level_pregenerator is None
+    assert loaded.seed == world.seed
+
+
+class CountingSource(object):
+
+    def __init__(self):
+        self.loads = 0
+
+    def load_level(self, level_key):
+        self.loads += 1
+        return Level()
+
+
+def test_pickling_level_mapping_doesnt_load_levels():
+    loaded_key, unloaded_key = LevelKey("dungeon", 1), LevelKey("dungeon", 2)
+    levels = LevelMapping({loaded_key: Level()}, unloaded=[unloaded_key], source=CountingSource())
+    copied = pickle.loads(pickle.dumps(levels))
+    assert levels.source.loads == copied.source.loads == 0
+    assert set(copied.loaded) == {loaded_key} and copied.unloaded == {unloaded_key}
+    copied[unloaded_key]
+    assert copied.source.loads == 1
+
+
+def test_level_generation_is_independent_of_order():
+    first_key, second_key = LevelKey("dungeon", 2), LevelKey("dungeon", 3)
+    world = get_world(1)
+    expected = get_level_data(world.get_level(first_key)), get_level_data(world.get_level(second_key))
+
+    world = get_world(1)
+    second = get_level_data(world.get_level(second_key))
+    first = get_level_data(world.get_level(first_key))
+    assert (first, second) == expected
+    assert first != second
+
+
+def test_level_seeds_differ():
+    world = get_world(1)
+    seeds = {world.get_level_seed(LevelKey(dungeon, index)) for dungeon in ("dungeon", "cave") for index in (1, 2)}
+    assert len(seeds) == 4
+    assert get_world(2).get_level_seed(LevelKey("dungeon", 1)) not in seeds
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite of the core algorithms of the game.
+
+Every benchmark is a setup function registered with the @benchmark decorator
+over a grid of parameters. The setup function builds its inputs outside of the
+timing and returns the function to be timed. That function is run enough times
+per round to take at least MIN_ROUND_TIME and the per call statistics over the
+rounds are stored as JSON.
+
+The compare mode checks a run against a stored baseline and reports the
+benchmarks whose median got slower by more than the threshold. The exit status
+is 1 if there are any.
+
+Run from the project root with:
+    python3 -m tools.benchmark [-k FILTER] [-o RESULTS.json] [--folder FOLDER]
+    python3 -m tools.benchmark --compare BASELINE.json [RESULTS.json] [--threshold 0.1]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import OrderedDict, deque
+from timeit import default_timer
+
+import fov
+import path
+import state_store
+from config.game import GameConf
+from enums.level_gen import LevelGen
+from generic_algorithms import bresenham
+from generic_structures import Array2D
+from rdg import generate_tiles_to
+from turn_scheduler import TurnScheduler
+from world.level import Level
+from world.offscreen_simulation import OffscreenSimulator
+from world.world import LevelKey
+
+
+ROUNDS = 5
+MIN_ROUND_TIME = 0.05
+DEFAULT_THRESHOLD = 0.1
+RESULTS_SUBFOLDER = "benchmarks"
+
+MAP_DIMENSIONS = ((26, 96), (100, 100))
+SIGHTS = (5, 20)
+CREATURE_COUNTS = (10, 100, 1000)
+
+# name: (setup function, parameter grid)
+benchmarks = OrderedDict()
+
+
+def benchmark(**param_grid):
+    """Register a setup function as a benchmark run with every combination of param_grid."""
+
+    def register(setup):
+        benchmarks[setup.__name__] = setup, OrderedDict(sorted(param_grid.items()))
+        return setup
+    return register
+
+
+def get_cases(name_filter=None):
+    """Yield (case name, setup function, params) of every registered benchmark matching name_filter."""
+    for name, (setup, param_grid) in benchmarks.items():
+        for values in itertools.product(*param_grid.values()):
+            params = OrderedDict(zip(param_grid, values))
+            case = name + "".join("[{}={}]".format(key, _format_param(value)) for key, value in params.items())
+            if name_filter is None or name_filter in case:
+                yield case, setup, params
+
+
+def _format_param(value):
+    if isinstance(value, tuple):
+        return "x".join(str(item) for item in value)
+    return str(value)
+
+
+def time_function(func, rounds=ROUNDS, min_round_time=MIN_ROUND_TIME):
+    """Return the per call statistics of func in seconds over the rounds."""
+    number = 1
+    while True:
+        start = default_timer()
+        for _ in range(number):
+            func()
+        elapsed = default_timer() - start
+        if elapsed >= min_round_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_round_time / elapsed) + 1))
+
+    times = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = default_timer()
+        for _ in range(number):
+            func()
+        times.append((default_timer() - start) / number)
+
+    return OrderedDict((
+        ("min", min(times)),
+        ("median", statistics.median(times)),
+        ("mean", statistics.mean(times)),
+        ("stdev", statistics.stdev(times) if len(times) > 1 else 0.0),
+        ("rounds", rounds),
+        ("calls_per_round", number),
+    ))
+
+
+def run(name_filter=None, rounds=ROUNDS, min_round_time=MIN_ROUND_TIME, report=None):
+    """Run the benchmarks, return the results as a JSON compatible dict."""
+    results = OrderedDict()
+    for case, setup, params in get_cases(name_filter):
+        stats = time_function(setup(**params), rounds, min_round_time)
+        stats["params"] = OrderedDict((key, list(value) if isinstance(value, tuple) else value)
+                                      for key, value in params.items())
+        results[case] = stats
+        if report is not None:
+            report(case, stats)
+
+    return OrderedDict((
+        ("created", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ("machine", OrderedDict((
+            ("python", platform.python_version()),
+            ("implementation", platform.python_implementation()),
+            ("platform", platform.platform()),
+            ("processor", platform.processor()),
+        ))),
+        ("results", results),
+    ))
+
+
+def compare(baseline, current):
+    """
+    Return a list of (case, baseline median, current median, change) of the cases in both.
+
+    change is the relative change of the median, positive is slower.
+    """
+    comparisons = []
+    for case, stats in current["results"].items():
+        if case in baseline["results"]:
+            old, new = baseline["results"][case]["median"], stats["median"]
+            comparisons.append((case, old, new, new / old - 1))
+    return comparisons
+
+
+def get_regressions(comparisons, threshold=DEFAULT_THRESHOLD):
+    return [comparison for comparison in comparisons if comparison[3] > threshold]
+
+
+def get_results_folder():
+    return os.path.join(GameConf.save_folder, RESULTS_SUBFOLDER)
+
+
+def save_results(results, results_path=None):
+    if results_path is None:
+        results_folder = get_results_folder()
+        os.makedirs(results_folder, exist_ok=True)
+        results_path = os.path.join(results_folder, "benchmark-{}.json".format(time.strftime("%Y%m%d-%H%M%S")))
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    return results_path
+
+
+def load_results(results_path):
+    with open(results_path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def print_case(case, stats):
+    print("{:<60} {:>12.3f} ms {:>10.3f} ms".format(case, stats["median"] * 1000, stats["stdev"] * 1000))
+
+
+def print_comparisons(comparisons, threshold):
+    print("{:<60} {:>12} {:>12} {:>8}".format("benchmark", "baseline", "current", "change"))
+    for case, old, new, change in comparisons:
+        flag = "  REGRESSION" if change > threshold else ""
+        print("{:<60} {:>9.3f} ms {:>9.3f} ms {:>+7.1%}{}".format(case, old * 1000, new * 1000, change, flag))
+
+
+# Benchmark inputs
+
+def get_level(dimensions, creature_count=0, seed=0):
+    random.seed(seed)
+    level = Level(danger_level=1, tiles=Array2D(dimensions), seed=seed)
+    level.creature_spawn_count = creature_count
+    level.finalize(LevelKey("dungeon", 1))
+    return level
+
+
+def get_origins(level, count=20, seed=0):
+    coords = [coord for coord in level.tiles.coord_iter() if level.is_passable(coord)]
+    return random.Random(seed).sample(coords, min(count, len(coords)))
+
+
+def get_visibility_func(level):
+    see_through = level.tiles.see_through
+    rows, cols = level.tiles.dimensions
+
+    def visibility_func(coord):
+        y, x = coord
+        return 0 <= y < rows and 0 <= x < cols and see_through[y * cols + x]
+    return visibility_func
+
+
+# Benchmarks
+
+@benchmark(dimensions=MAP_DIMENSIONS, sight=SIGHTS)
+def shadowcast_light_set(dimensions, sight):
+    level = get_level(dimensions)
+    origins = get_origins(level)
+    visibility_func = get_visibility_func(level)
+    rows, cols = dimensions
+
+    def run_shadowcast():
+        for origin in origins:
+            fov.ShadowCast.get_light_set(visibility_func, origin, sight, rows, cols)
+    return run_shadowcast
+
+
+@benchmark(dimensions=MAP_DIMENSIONS, sight=SIGHTS)
+def bresenham_light_set(dimensions, sight):
+    level = get_level(dimensions)
+    origins = get_origins(level)
+    visibility_func = get_visibility_func(level)
+
+    def run_bresenham_fov():
+        for origin in origins:
+            fov.Bresenham.get_light_set(visibility_func, origin, sight)
+    return run_bresenham_fov
+
+
+@benchmark(dimensions=MAP_DIMENSIONS)
+def a_star_path(dimensions):
+    level = get_level(dimensions)
+    origins = get_origins(level, count=10)
+    pairs = list(zip(origins, reversed(origins)))
+
+    def run_paths():
+        for start, goal in pairs:
+            try:
+                path.path(start, goal, level.get_neighbor_location_coords_and_costs, level._a_star_heuristic)
+            except path.PathException:
+                pass
+    return run_paths
+
+
+@benchmark(dimensions=MAP_DIMENSIONS)
+def hpa_path(dimensions):
+    """The a_star_path paths searched on the cluster graph, which is built before timing."""
+    level = get_level(dimensions)
+    origins = get_origins(level, count=10)
+    pairs = list(zip(origins, reversed(origins)))
+    level.path(*pairs[0])
+
+    def run_paths():
+        for start, goal in pairs:
+            try:
+                level.path(start, goal)
+            except path.PathException:
+                pass
+    return run_paths
+
+
+@benchmark(length=(10, 100))
+def bresenham_line(length):
+    rng = random.Random(0)
+    lines = [((0, 0), (rng.randint(-length, length), rng.choice((-length, length)))) for _ in range(100)]
+
+    def run_lines():
+        for start, end in lines:
+            for _ in bresenham(start, end):
+                pass
+    return run_lines
+
+
+@benchmark(creature_count=CREATURE_COUNTS)
+def turn_scheduler(creature_count):
+    rng = random.Random(0)
+    costs = [rng.choice((500, 1000, 1500, 2000)) for _ in range(creature_count)]
+    removed = list(range(0, creature_count, 10))
+
+    def run_scheduler():
+        scheduler = TurnScheduler()
+        for creature, cost in enumerate(costs):
+            scheduler.add(creature, cost)
+        for cost in costs:
+            creature, _ = scheduler.advance_time()
+            scheduler.addpop(creature, cost)
+        for creature in removed:
+            scheduler.remove(creature)
+    return run_scheduler
+
+
+@benchmark(creature_count=(1000, 10000))
+def turn_scheduler_churn(creature_count):
+    """1000 turns on a full scheduler where every fourth turn a creature dies and another spawns."""
+    rng = random.Random(0)
+    scheduler = TurnScheduler()
+    creatures = [object() for _ in range(creature_count)]
+    for creature in creatures:
+        scheduler.add(creature, rng.randrange(2000))
+    costs = [rng.choice((500, 1000, 1500, 2000)) for _ in range(1000)]
+    victims = [rng.randrange(creature_count) for _ in range(1000)]
+
+    def run_churn():
+        for turn, cost in enumerate(costs):
+            creature, _ = scheduler.advance_time()
+            scheduler.addpop(creature, cost)
+            if turn % 4 == 0:
+                index = victims[turn]
+                spawned = object()
+                scheduler.remove(creatures[index])
+                creatures[index] = spawned
+                scheduler.add(spawned, cost)
+    return run_churn
+
+
+@benchmark(creature_count=(1000, 10000))
+def turn_scheduler_long_removals(creature_count):
+    """
+    1000 turns on a full scheduler where every turn a long timer is started and
+    the one started four turns before is cancelled. Cancelled timers are deep in
+    the heap so they are only dropped by compaction.
+    """
+    rng = random.Random(0)
+    scheduler = TurnScheduler()
+    for creature in range(creature_count):
+        scheduler.add(creature, rng.randrange(2000))
+    costs = [rng.choice((500, 1000, 1500, 2000)) for _ in range(1000)]
+    timers = deque()
+
+    def run_long_removals():
+        for cost in costs:
+            creature, _ = scheduler.advance_time()
+            scheduler.addpop(creature, cost)
+            timer = object()
+            scheduler.add(timer, 10 ** 9)
+            timers.append(timer)
+            if len(timers) > 4:
+                scheduler.remove(timers.popleft())
+    return run_long_removals
+
+
+@benchmark(creature_count=CREATURE_COUNTS)
+def offscreen_catch_up(creature_count):
+    """Catch up a level out of sight for the longest lag that is simulated."""
+    level = get_level(MAP_DIMENSIONS[-1], creature_count)
+    simulator = OffscreenSimulator()
+    lag = simulator.max_catch_up_buckets * simulator.bucket_time
+
+    def run_catch_up():
+        level.simulated_time = 0
+        simulator.catch_up(level, lag)
+    return run_catch_up
+
+
+@benchmark(dimensions=MAP_DIMENSIONS)
+def rdg_generate_tiles(dimensions):
+    seeds = itertools.count()
+
+    def run_generation():
+        level = Level(generation_type=LevelGen.Dungeon, tiles=Array2D(dimensions), seed=next(seeds))
+        generate_tiles_to(level)
+    return run_generation
+
+
+def _get_simulated_game(turns):
+    from tools.simulate import new_headless_game, simulate
+    game = new_headless_game(seed=0, game_name="benchmark")
+    simulate(game, turns)
+    return game
+
+
+@benchmark(turns=(0, 200))
+def state_store_save(turns):
+    game = _get_simulated_game(turns)
+
+    def run_save():
+        # Forget the previous save so every chunk gets compressed
+        game.world.levels.source = None
+        state_store.save(game, "benchmark")
+    return run_save
+
+
+@benchmark(turns=(0, 200))
+def state_store_load(turns):
+    state_store.save(_get_simulated_game(turns), "benchmark")
+
+    def run_load():
+        loaded = state_store.load("benchmark")
+        levels = loaded.world.levels
+        for level_key in list(levels.unloaded):
+            levels[level_key]
+    return run_load
+
+
+@benchmark(dimensions=MAP_DIMENSIONS, creature_count=CREATURE_COUNTS[:2])
+def game_update_view(dimensions, creature_count):
+    from tools.simulate import new_headless_game
+    game = new_headless_game(seed=0, game_name="benchmark")
+    game.headless = False
+    player = game.player
+    level = get_level(dimensions, creature_count)
+    player.level.remove_creature(player)
+    level.add_creature(player)
+    # More origins than fit the vision cache so every view is computed
+    origins = itertools.cycle(get_origins(level, count=level.vision_cache_size + 1))
+
+    def run_update_view():
+        coord = next(origins)
+        if coord not in level.creatures:
+            level.move_creature(player, coord)
+        game.update_view(player)
+    return run_update_view
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="pyrl benchmark suite")
+    parser.add_argument("-k", dest="name_filter", help="Only run benchmarks whose name contains this.")
+    parser.add_argument("-o", "--output", help="Path of the results file. Defaults to a timestamped file in "
+                                               "the {} subfolder of the save folder.".format(RESULTS_SUBFOLDER))
+    parser.add_argument("--folder", help="Save folder for the results and the games saved by the benchmarks. "
+                                         "Defaults to " + GameConf.save_folder)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against the baseline results file.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown of the median that counts as a regression.")
+    parser.add_argument("results", nargs="?", help="With --compare, a results file to compare instead of a new run.")
+    options = parser.parse_args(args)
+    if options.folder is not None:
+        GameConf.save_folder = options.folder
+
+    if options.results is not None:
+        results = load_results(options.results)
+    else:
+        print("{:<60} {:>15} {:>13}".format("benchmark", "median", "stdev"))
+        results = run(options.name_filter, options.rounds, report=print_case)
+        print("Results saved to {}".format(save_results(results, options.output)))
+
+    if options.compare is not None:
+        comparisons = compare(load_results(options.compare), results)
+        print()
+        print_comparisons(comparisons, options.threshold)
+        regressions = get_regressions(comparisons, options.threshold)
+        if regressions:
+            print("{} regression(s) over {:.0%}".format(len(regressions), options.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark drawing a full level cell by cell against drawing it in runs.
+
+The cells of a generated level are drawn the way a full redraw does. First with
+a mock window counting the calls made and then to a real curses pad in a
+pseudo-terminal.
+
+Run from the project root with: python3 -m tools.draw_benchmark
+"""
+import os
+import pickle
+import pty
+import random
+import sys
+import traceback
+from timeit import Timer
+
+from io_wrappers.curses import get_runs
+from world.level import Level
+from world.world import LevelKey
+
+
+REPEATS = 5
+NUMBER = 20
+
+
+def get_redraw_cells(seed):
+    """Return the cells of a full redraw of a level in sight and out of sight."""
+    random.seed(seed)
+    level = Level(danger_level=1, seed=seed)
+    level.finalize(LevelKey("dungeon", 1))
+    coords = list(level.tiles.coord_iter())
+    return (list(level.get_vision_information(coords, frozenset(coords))),
+            list(level.get_vision_information(coords, frozenset())))
+
+
+def draw_cells(addch, addstr, color_map, cells):
+    for (y, x), (symbol, color) in cells:
+        addch(y, x, symbol, color_map[color])
+
+
+def draw_runs(addch, addstr, color_map, cells):
+    for y, x, string, color in get_runs(cells):
+        addstr(y, x, string, color_map[color])
+
+
+class CountingPad(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def addch(self, y, x, symbol, attribute):
+        self.calls += 1
+
+    def addstr(self, y, x, string, attribute):
+        self.calls += 1
+
+
+class ColorMap(dict):
+
+    def __missing__(self, color):
+        return 0
+
+
+def time_draw(draw, pad, color_map, cells):
+    timer = Timer(lambda: draw(pad.addch, pad.addstr, color_map, cells))
+    return min(timer.repeat(repeat=REPEATS, number=NUMBER)) / NUMBER
+
+
+def benchmark_mock(cells):
+    results = []
+    for draw in (draw_cells, draw_runs):
+        pad = CountingPad()
+        draw(pad.addch, pad.addstr, ColorMap(), cells)
+        results.append((draw.__name__, pad.calls, time_draw(draw, CountingPad(), ColorMap(), cells)))
+    return results
+
+
+def benchmark_curses(cells, memory_cells):
+    import curses
+    from io_wrappers.curses_dicts import Curses256ColorDict, CursesColorDict
+
+    rows = max(y for (y, x), _ in cells) + 2
+    cols = max(x for (y, x), _ in cells) + 1
+    os.environ["LINES"], os.environ["COLUMNS"] = str(rows), str(cols)
+    curses.initscr()
+    try:
+        curses.start_color()
+        color_map = Curses256ColorDict() if curses.COLORS == 256 else CursesColorDict()
+        pad = curses.newpad(rows, cols)
+        results = []
+        for draw in (draw_cells, draw_runs):
+            def draw_and_output():
+                # Alternate between the frames so the terminal has something to output
+                for frame in (cells, memory_cells):
+                    draw(pad.addch, pad.addstr, color_map, frame)
+                    pad.noutrefresh(0, 0, 0, 0, rows - 2, cols - 1)
+                    curses.doupdate()
+            timer = Timer(draw_and_output)
+            results.append((draw.__name__, time_draw(draw, pad, color_map, cells),
+                            min(timer.repeat(repeat=REPEATS, number=NUMBER)) / NUMBER / 2))
+        return results
+    finally:
+        curses.endwin()
+
+
+def run_in_pseudo_terminal(func, *args):
+    """Run func in a child process attached to a pseudo-terminal and return its result."""
+    read_fd, write_fd = os.pipe()
+    pid, terminal_fd = pty.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.environ["TERM"] = "xterm-256color"
+        with os.fdopen(write_fd, "wb") as f:
+            try:
+                result = func(*args)
+            except Exception:
+                result = RuntimeError(traceback.format_exc())
+            pickle.dump(result, f)
+        os._exit(0)
+
+    os.close(write_fd)
+    # The terminal output has to be read for the child not to block on it
+    try:
+        while os.read(terminal_fd, 65536):
+            pass
+    except OSError:
+        pass
+    with os.fdopen(read_fd, "rb") as f:
+        result = pickle.load(f)
+    os.waitpid(pid, 0)
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def main(seed=0):
+    cells, memory_cells = get_redraw_cells(seed)
+    print("Full redraw of {} cells".format(len(cells)))
+
+    print("\nMock window")
+    print("{:>12} {:>8} {:>12}".format("method", "calls", "time"))
+    for name, calls, seconds in benchmark_mock(cells):
+        print("{:>12} {:>8} {:>9.3f} ms".format(name, calls, seconds * 1000))
+
+    print("\nCurses pad in a pseudo-terminal")
+    print("{:>12} {:>12} {:>18}".format("method", "draw", "draw and output"))
+    for name, draw_seconds, output_seconds in run_in_pseudo_terminal(benchmark_curses, cells, memory_cells):
+        print("{:>12} {:>9.3f} ms {:>15.3f} ms".format(name, draw_seconds * 1000, output_seconds * 1000))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fov algorithms against each other.
+
+Run from the project root with: python3 -m tools.fov_benchmark
+"""
+import random
+import sys
+from timeit import Timer
+
+import fov
+from enums.level_gen import LevelGen
+from generic_structures import Array2D
+from rdg import generate_tiles_to
+from world.level import Level
+
+
+MAP_DIMENSIONS = ((26, 96), (500, 500))
+SIGHTS = (5, 10, 20, 40)
+ORIGIN_COUNT = 10
+REPEATS = 3
+
+
+def get_level(dimensions, generation_type):
+    level = Level(generation_type=generation_type, tiles=Array2D(dimensions))
+    generate_tiles_to(level)
+    return level
+
+
+def time_algorithm(algorithm, level, origins, sight):
+    see_through = level.tiles.see_through
+    rows, cols = level.tiles.dimensions
+
+    def run():
+        for origin in origins:
+            algorithm.get_light_set_from_plane(see_through, origin, sight, rows, cols)
+
+    best = min(Timer(run).repeat(repeat=REPEATS, number=1))
+    return best / len(origins)
+
+
+def main(seed=0):
+    random.seed(seed)
+    header = "{:>10} {:>8} {:>6}" + " {:>22}" * len(fov.algorithms)
+    row = "{:>10} {:>8} {:>6}" + " {:>19.3f} ms" * len(fov.algorithms)
+    print(header.format("map", "layout", "sight", *fov.algorithms))
+    for dimensions in MAP_DIMENSIONS:
+        for generation_type in (LevelGen.Dungeon, LevelGen.Arena):
+            level = get_level(dimensions, generation_type)
+            origins = [level.free_coord() for _ in range(ORIGIN_COUNT)]
+            for sight in SIGHTS:
+                timings = (time_algorithm(algorithm, level, origins, sight) * 1000
+                           for algorithm in fov.algorithms.values())
+                print(row.format("{}x{}".format(*dimensions), generation_type.name, sight, *timings))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,69 @@
+"""
+Statistical profiler taking periodic stack samples of a thread.
+
+A background thread wakes up every interval, reads the current frame of the
+profiled thread with sys._current_frames and counts the stack. Unlike cProfile
+nothing is done on function calls, so the profiled code runs at near full speed
+and the timings stay realistic.
+
+The samples are written in the collapsed stack format, one line per stack with
+the frames root first separated by semicolons and the sample count last. Tools
+such as flamegraph.pl and speedscope make flame graphs from it:
+
+    flamegraph.pl save_data/profile_samples.collapsed > flamegraph.svg
+"""
+import os
+import sys
+import threading
+from collections import Counter
+
+
+class SamplingProfiler(object):
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.samples = Counter()
+        self._frame_labels = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _sample_loop(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                # The profiled thread has ended
+                return
+            self.samples[self._get_stack(frame)] += 1
+
+    def _get_stack(self, frame):
+        labels = self._frame_labels
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = "{}:{}".format(os.path.basename(code.co_filename), code.co_name)
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        return ";".join(stack)
+
+    def get_collapsed_lines(self):
+        return ["{} {}".format(stack, count) for stack, count in sorted(self.samples.items())]
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for line in self.get_collapsed_lines():
+                f.write(line + "\n")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark the save codecs against each other on a fully explored world.
+
+Every level of the world is generated and marked as seen by the player. Then the
+game is saved and loaded once with every codec.
+
+Run from the project root with: python3 -m tools.save_benchmark
+"""
+import os
+import sys
+from timeit import default_timer
+
+import main
+import state_store
+from config.game import GameConf
+from generic_structures import CoordBitmap
+from io_wrappers.mock import MockWrapper
+
+
+SAVE_NAME = "save_benchmark"
+
+
+def get_explored_game():
+    game = main.prepare_game(MockWrapper, cmdline_args=("-g", SAVE_NAME))
+    world = game.world
+    for level_key in list(world.levels):
+        level = world.get_level(level_key)
+        game.player.visited_locations[level_key] = CoordBitmap(level.tiles.dimensions, level.tiles.coord_iter())
+    return game
+
+
+def time_call(func, *args):
+    start = default_timer()
+    result = func(*args)
+    return default_timer() - start, result
+
+
+def benchmark_codec(game, codec_name):
+    # Forget the previous save so every chunk gets compressed
+    game.world.levels.source = None
+    save_time, (uncompressed, size) = time_call(state_store.save, game, SAVE_NAME, codec_name)
+
+    load_time, loaded = time_call(state_store.load, SAVE_NAME)
+    levels = loaded.world.levels
+    load_all_time, _ = time_call(lambda: [levels[level_key] for level_key in list(levels)])
+    return uncompressed, size, save_time, load_time, load_all_time
+
+
+def main_benchmark(codec_names):
+    game = get_explored_game()
+    # Warm up so the first codec isn't penalized
+    benchmark_codec(game, "none")
+    print("Compression level: {}, threads: {}".format(GameConf.save_compression_level,
+                                                     GameConf.save_compression_threads or os.cpu_count()))
+    header = "{:>6} {:>12} {:>7} {:>10} {:>10} {:>14}"
+    row = "{:>6} {:>10,} b {:>6.1%} {:>8.0f} ms {:>8.0f} ms {:>12.0f} ms"
+    print(header.format("codec", "size", "ratio", "save", "load", "load levels"))
+    for codec_name in codec_names:
+        uncompressed, size, save_time, load_time, load_all_time = benchmark_codec(game, codec_name)
+        print(row.format(codec_name, size, size / uncompressed, save_time * 1000,
+                         load_time * 1000, load_all_time * 1000))
+    os.remove(os.path.join(GameConf.save_folder, SAVE_NAME + state_store._SAVE_FILETYPE))
+
+
+if __name__ == '__main__':
+    main_benchmark(sys.argv[1:] or list(state_store.codecs))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Run a game headless for a number of player turns as fast as it goes.
+
+The game runs on the mock io wrapper with drawing, autosaving and level
+pregeneration turned off and the player is played by a policy instead of the keyboard. After the run the
+turns and creature actions per second are reported along with the time spent
+in the subsystems of the game as recorded by the instrumentation timers. The
+subsystem times are inclusive: the AI time also contains the fov and pathing done
+by the AI.
+
+Run from the project root with: python3 -m tools.simulate [turns] [policy] [seed]
+"""
+import random
+import sys
+from collections import OrderedDict
+from timeit import default_timer
+
+import main
+from config.game import GameConf
+from enums.directions import Dir
+from enums.level_location import LevelLocation
+from game_actions import ActionError, GameActions, GameActionsProperties
+from generic_algorithms import add_vector
+from instrumentation import instruments
+from io_wrappers.mock import MockWrapper
+
+
+SIMULATION_GAME_NAME = "simulation"
+
+
+class ExplorePolicy(GameActionsProperties, object):
+
+    """
+    Plays the player by heading to the downwards passage and descending.
+
+    Adjacent creatures are attacked on the way. When there is no way further down
+    the player wanders randomly. The player is healed every turn so runs don't end
+    in death.
+    """
+
+    def __init__(self, game_actions, rng):
+        self.actions = game_actions
+        self.rng = rng
+
+    def act(self):
+        self.creature.hp = self.creature.max_hp
+        for direction in Dir.All:
+            if add_vector(self.coord, direction) in self.level.creatures:
+                return self.actions.attack(direction)
+
+        if self.level.locations.has_value(LevelLocation.Passage_Down):
+            goal = self.level.get_location_coord(LevelLocation.Passage_Down)
+            if goal == self.coord:
+                feedback = self.actions.enter_passage()
+                if feedback.type not in ActionError:
+                    return feedback
+            else:
+                feedback = self._move_towards(goal)
+                if feedback is not None:
+                    return feedback
+        return self._move_random()
+
+    def _move_towards(self, goal):
+        distance_map = self.level.get_distance_map(goal)
+        steps = [(distance_map[coord], direction) for direction, coord in self._neighbors()
+                 if coord in distance_map and self.actions.can_move(direction)]
+        if not steps:
+            return None
+        return self.actions.move(min(steps)[1])
+
+    def _move_random(self):
+        directions = [direction for direction in Dir.All if self.actions.can_move(direction)]
+        if directions:
+            return self.actions.move(self.rng.choice(directions))
+        return self.actions.wait()
+
+    def _neighbors(self):
+        for direction in Dir.All:
+            yield direction, add_vector(self.coord, direction)
+
+
+class WanderPolicy(ExplorePolicy):
+
+    """Plays the player by moving randomly and attacking adjacent creatures."""
+
+    def act(self):
+        self.creature.hp = self.creature.max_hp
+        for direction in Dir.All:
+            if add_vector(self.coord, direction) in self.level.creatures:
+                return self.actions.attack(direction)
+        return self._move_random()
+
+
+policies = OrderedDict((
+    ("explore", ExplorePolicy),
+    ("wander",  WanderPolicy),
+))
+
+
+class SimulationResult(object):
+
+    def __init__(self, turns, creature_actions, seconds, subsystem_times, subsystem_calls, levels):
+        self.turns = turns
+        self.creature_actions = creature_actions
+        self.seconds = seconds
+        self.subsystem_times = subsystem_times
+        self.subsystem_calls = subsystem_calls
+        self.levels = levels
+
+    @property
+    def turns_per_second(self):
+        return self.turns / self.seconds
+
+    @property
+    def creature_actions_per_second(self):
+        return self.creature_actions / self.seconds
+
+    def report(self):
+        lines = [
+            "{:,} player turns, {:,} creature actions, {} levels visited in {:.2f} s".format(
+                self.turns, self.creature_actions, self.levels, self.seconds),
+            "{:>12,.0f} turns/s".format(self.turns_per_second),
+            "{:>12,.0f} creature actions/s".format(self.creature_actions_per_second),
+            "",
+            "{:>12} {:>10} {:>7} {:>10}".format("subsystem", "time", "share", "calls"),
+        ]
+        for name, seconds in self.subsystem_times.items():
+            lines.append("{:>12} {:>7.0f} ms {:>7.1%} {:>10,}".format(
+                name, seconds * 1000, seconds / self.seconds, self.subsystem_calls[name]))
+        return "\n".join(lines)
+
+
+def new_headless_game(seed=0, game_name=SIMULATION_GAME_NAME):
+    """Return a new game on the mock io wrapper with rendering, autosaving and level pregeneration turned off."""
+    world_seed, pregenerate_levels = GameConf.world_seed, GameConf.pregenerate_levels
+    # Levels are finalized in the game process so headless runs don't start worker processes
+    GameConf.world_seed, GameConf.pregenerate_levels = seed, False
+    try:
+        game = main.prepare_game(MockWrapper, cmdline_args=("-g", game_name))
+    finally:
+        GameConf.world_seed, GameConf.pregenerate_levels = world_seed, pregenerate_levels
+    game.headless = True
+    return game
+
+
+def simulate(game, turns, policy="explore", seed=0):
+    """Play game for the given amount of player turns with policy, return a SimulationResult."""
+    game.user_controller = policies[policy](GameActions(game, game.player), random.Random(seed))
+    ai_game_actions = GameActions(game)
+    player = game.player
+    end_turn = game.turn_counter + turns
+    creature_actions = 0
+    levels = {game.active_level.key}
+
+    was_enabled = instruments.enabled
+    instruments.reset()
+    instruments.enabled = True
+    try:
+        start = default_timer()
+        while game.turn_counter < end_turn:
+            if game.play_turn(ai_game_actions) is player:
+                levels.add(game.active_level.key)
+            else:
+                creature_actions += 1
+        seconds = default_timer() - start
+    finally:
+        instruments.enabled = was_enabled
+
+    totals = instruments.get_subsystem_totals()
+    subsystem_times = OrderedDict((name, total) for name, (calls, total) in totals.items())
+    subsystem_calls = OrderedDict((name, calls) for name, (calls, total) in totals.items())
+    return SimulationResult(turns, creature_actions, seconds, subsystem_times, subsystem_calls, len(levels))
+
+
+def main_simulation(turns=1000, policy="explore", seed=0):
+    game = new_headless_game(seed)
+    print(simulate(game, turns, policy, seed).report())
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main_simulation(int(args[0]) if len(args) > 0 else 1000,
+                    args[1] if len(args) > 1 else "explore",
+                    int(args[2]) if len(args) > 2 else 0)
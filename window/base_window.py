@@ -2,7 +2,7 @@ import time
 
 from enums.colors import Pair
 from enums.keys import Key
-from generic_structures import TableDims, Coord
+from generic_structures import Event, TableDims, Coord
 
 
 class BaseWindow(object):
@@ -15,6 +15,7 @@ class BaseWindow(object):
         self.rows, self.cols = TableDims(*dimensions)
         self.screen_position = Coord(*screen_position)
         self.cursor_win = cursor_lib.new_window(dimensions)
+        self.blitted = Event()
 
     def draw_char(self, char, coord):
         self.cursor_win.draw_char(char, coord)
@@ -78,6 +79,7 @@ class BaseWindow(object):
 
     def blit(self):
         self.cursor_win.blit((self.rows, self.cols), self.screen_position)
+        self.blitted.trigger()
 
     def refresh(self):
         self.blit()
@@ -5,22 +5,74 @@ from window.base_window import BaseWindow
 
 class LevelWindow(BaseWindow):
 
-    """Handles the level display."""
+    """
+    Handles the level display.
+
+    Keeps a shadow framebuffer of the (symbol, color) last drawn to every cell so
+    only changed cells are passed on to the cursor library and the window is only
+    blitted when something changed.
+
+    clear() starts a new frame. Cells drawn after it are compared to the
+    framebuffer on the next update and cells not drawn again are blanked then,
+    so redrawing the whole level only outputs what actually changed.
+    """
+
+    blank = (" ", Pair.Normal)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.framebuffer = {}
+        self.frame = None
+        self.damaged = True
 
     def update(self):
-        self.blit()
+        if self.frame is not None:
+            frame, self.frame = self.frame, None
+            self._draw_changes([(coord, self.blank) for coord in self.framebuffer if coord not in frame])
+            self._draw_changes(frame.items())
+        if self.damaged:
+            self.blit()
+            self.damaged = False
+
+    def refresh(self):
+        self.update()
+        self.cursor_lib.flush()
+
+    def clear(self):
+        # Clearing also means the window is wanted back on the screen eg. after a menu covered it
+        self.frame = {}
+        self.damaged = True
+
+    def draw(self, char_payload_sequence):
+        if self.frame is not None:
+            self.frame.update(char_payload_sequence)
+        else:
+            self._draw_changes(char_payload_sequence)
+
+    def draw_reverse(self, char_payload_sequence):
+        self.draw((coord, (symbol, (bg, fg))) for coord, (symbol, (fg, bg)) in char_payload_sequence)
 
     def draw_char(self, char, coord, reverse=False):
         if reverse:
             symbol, (fg, bg) = char
             char = symbol, (bg, fg)
-        super().draw_char(char, coord)
+        self.draw(((coord, char),))
 
     def draw_line(self, coordA, coordB, char=('*', Pair.Yellow), includeFirst=False):
         if includeFirst:
             for coord in bresenham(coordA, coordB):
-                self.draw_char(coord, char)
+                self.draw_char(char, coord)
         else:
             for coord in bresenham(coordA, coordB):
                 if coord != coordA:
-                    self.draw_char(coord, char)
+                    self.draw_char(char, coord)
+
+    def _draw_changes(self, char_payload_sequence):
+        framebuffer = self.framebuffer
+        blank = self.blank
+        changes = [(coord, char) for coord, char in char_payload_sequence
+                   if framebuffer.get(coord, blank) != char]
+        if changes:
+            framebuffer.update(changes)
+            self.cursor_win.draw(changes)
+            self.damaged = True
@@ -24,14 +24,22 @@ class MessageBar(BaseWindow):
         self.history = []
         self.msgqueue = []
         self.wrap = textwrap.TextWrapper(width=(self.cols - MORE_STR_LEN)).wrap
+        self.is_showing_messages = False
+        self.damaged = True
 
     def update(self):
-        self.clear()
-        if self.msgqueue:
-            self.print_event(self.msgqueue)
-            self.add_lines_to_history(self.msgqueue)
-            self.msgqueue = []
-        self.blit()
+        # Messages are shown until the next update so an empty bar only needs a blit when it was covered
+        if self.msgqueue or self.is_showing_messages:
+            self.clear()
+            self.is_showing_messages = bool(self.msgqueue)
+            if self.msgqueue:
+                self.print_event(self.msgqueue)
+                self.add_lines_to_history(self.msgqueue)
+                self.msgqueue = []
+            self.damaged = True
+        if self.damaged:
+            self.blit()
+            self.damaged = False
 
     def debug_msg(self, obj):
         logging.debug("io.msg: {}".format(obj))
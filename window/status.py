@@ -6,7 +6,12 @@ from window.base_window import BaseWindow
 
 class StatusBar(BaseWindow):
 
-    """Handles the status bar system."""
+    """
+    Handles the status bar system.
+
+    The values of the elements are compared to the ones last printed on every
+    update. The bar is only wrapped, drawn and blitted again when one changed.
+    """
 
     @wraps(BaseWindow.__init__, assigned=())
     def __init__(self, *args, **kwargs):
@@ -14,17 +19,32 @@ class StatusBar(BaseWindow):
 
         self.elements = []
         self.wrapper = textwrap.TextWrapper(width=self.cols)
+        self.values = None
+        self.damaged = True
 
     def update(self):
-        self.clear()
-        self.print_elements()
-        self.blit()
+        values = self.get_values()
+        if values != self.values:
+            self.values = values
+            self.clear()
+            self.print_elements(values)
+            self.damaged = True
+        if self.damaged:
+            self.blit()
+            self.damaged = False
 
     def add_element(self, string, getter):
         self.elements.append((string, getter))
+        self.values = None
+
+    def get_values(self):
+        return [getter() for _, getter in self.elements]
 
-    def print_elements(self):
-        status_string = "  ".join("{}:{}".format(string, getter()) for string, getter in self.elements)
+    def print_elements(self, values=None):
+        if values is None:
+            values = self.get_values()
+        status_string = "  ".join("{}:{}".format(string, value)
+                                  for (string, _), value in zip(self.elements, values))
         lines = self.wrapper.wrap(status_string)
         for i, line in enumerate(lines):
             self.draw_str(line, (i, 0))
@@ -6,6 +6,7 @@ from config.game import GameConf
 from enums.colors import Pair
 from game_data.levels import default_level_dimensions
 from generic_structures import TableDims, Coord
+from instrumentation import timed
 from window.base_window import BaseWindow
 from window.level import LevelWindow
 from window.message import MessageBar
@@ -28,6 +29,8 @@ class WindowSystem(object):
         self.level_window = LevelWindow(cursor_lib, default_level_dimensions, level_position)
         status_position   = Coord(self.level_window.screen_position.y + self.level_window.rows, 0)
         self.status_bar   = StatusBar(cursor_lib, self.status_dimensions, status_position)
+        # Menus and views drawn on the whole window cover the other windows
+        self.whole_window.blitted.subscribe(self.invalidate)
 
         self.prepared_input = deque()
 
@@ -53,6 +56,13 @@ class WindowSystem(object):
     def msg(self, *messages):
         self.message_bar.queue_msg(*messages)
 
+    def invalidate(self):
+        """Blit every window on the next refresh eg. after something was drawn over them."""
+        self.message_bar.damaged = True
+        self.level_window.damaged = True
+        self.status_bar.damaged = True
+
+    @timed("render.refresh")
     def refresh(self):
         self.message_bar.update()
         self.level_window.update()
@@ -93,6 +103,7 @@ class WindowSystem(object):
 
     def get_str(self, ask_line="", coord=(0, 0)):
         self.message_bar.clear()
+        self.message_bar.is_showing_messages = True
         return self.message_bar.get_str(ask_line=ask_line, coord=coord)
 
     def get_future_time(self, delay):
@@ -1,9 +1,11 @@
 import itertools
-import random
+from collections import OrderedDict
 from functools import wraps
 
+import fov
 import path
 from config.debug import Debug
+from config.game import GameConf
 from enums.directions import Dir
 from enums.level_gen import LevelGen
 from enums.level_location import LevelLocation
@@ -11,15 +13,29 @@ from game_actions import Action
 from game_data.creatures import creatures
 from game_data.levels import default_level_dimensions
 from generic_algorithms import bresenham, cross_product, add_vector
-from generic_structures import Event, Array2D, OneToOneMapping
+from generic_structures import Event, Array2D, CoordBitmap, OneToOneMapping, SpatialIndex
+from hpa import ClusterGraph
+from instrumentation import count, timed
 from rdg import generate_tiles_to
+from rng import get_stream, new_seed
 from turn_scheduler import TurnScheduler
+from world.level_tiles import LevelTiles
+
+
+_neighbor_move_mults = tuple((direction, Dir.move_mult(direction)) for direction in Dir.All)
 
 
 class Level(object):
 
+    # Amount of (coord, sight) coord sets kept in each of the vision caches
+    vision_cache_size = 256
+    # Amount of (coord, sight) light bitmaps kept, they take a byte per tile each
+    light_bitmap_cache_size = 16
+    # Amount of goal coord distance maps kept in the distance map cache
+    distance_map_cache_size = 8
+
     def __init__(self, danger_level=0, generation_type=LevelGen.Dungeon, tiles=None,
-                 locations=(), custom_creatures=(), creature_spawning=True):
+                 locations=(), custom_creatures=(), creature_spawning=True, seed=None):
         # Generation
         self.danger_level = danger_level
         self.generation_type = generation_type
@@ -29,15 +45,16 @@ class Level(object):
 
         # Normal usage
         if tiles is None:
-            self.tiles = Array2D(default_level_dimensions)
+            self.tiles = LevelTiles(default_level_dimensions)
         else:
-            self.tiles = tiles
+            self.tiles = LevelTiles(tiles.dimensions, tiles)
 
         self.locations = OneToOneMapping(locations)
         self.visible_change = Event()
         self.turn_scheduler = TurnScheduler()
         self.creatures = {}
         self.items = {}
+        self._init_spatial_indexes()
 
         if self.generation_type.value > LevelGen.ExtendExisting.value:
             self.rows, self.cols = self.tiles.dimensions
@@ -45,12 +62,64 @@ class Level(object):
             self.rows, self.cols = default_level_dimensions
 
         self.is_finalized = False
+        # Game time up to which the level has been simulated while out of sight
+        self.simulated_time = None
+        self._init_caches()
+        self.set_seed(new_seed() if seed is None else seed)
+
+    def set_seed(self, seed):
+        """
+        Reset the random streams of the level from seed.
+
+        Every subsystem gets its own stream so eg. a change in monster behaviour
+        doesn't change what the level looks like.
+        """
+        self.seed = seed
+        self.generation_random = get_stream(seed, "generation")
+        self.spawn_random = get_stream(seed, "spawn")
+        self.ai_random = get_stream(seed, "ai")
+        self.combat_random = get_stream(seed, "combat")
+        self.offscreen_random = get_stream(seed, "offscreen")
+
+    def _init_caches(self):
+        self._light_set_cache = OrderedDict()
+        self._los_set_cache = OrderedDict()
+        self._light_bitmap_cache = OrderedDict()
+        self._vision_cache_revision = self.tiles.see_through_revision
+        self._distance_map_cache = OrderedDict()
+        self._distance_map_cache_revision = self.tiles.movement_revision
+        # Built on the first path search and kept up to date from tile changes after that
+        self.cluster_graph = None
+
+    def _init_spatial_indexes(self):
+        """
+        Build the spatial indexes of the coords of creatures and items.
+
+        They are kept in sync with the creatures and items dicts by the methods
+        changing them and answer area queries like "creatures within radius".
+        """
+        self.creature_index = SpatialIndex(self.creatures)
+        self.item_index = SpatialIndex(self.items)
+
+    def __getstate__(self):
+        exclude_state = ('_light_set_cache', '_los_set_cache', '_light_bitmap_cache', '_vision_cache_revision',
+                         '_distance_map_cache', '_distance_map_cache_revision',
+                         'creature_index', 'item_index', 'cluster_graph')
+        state = vars(self).copy()
+        for item in exclude_state:
+            del state[item]
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._init_caches()
+        self._init_spatial_indexes()
 
     def will_have_location(self, location):
         if location == LevelLocation.Random_Location:
             return True
 
-        if location in self.locations.values():
+        if self.locations.has_value(location):
             return True
 
         if self.generation_type != LevelGen.NoGeneration:
@@ -61,9 +130,14 @@ class Level(object):
     def get_creature_spawn_list(self):
         creature_list = []
         for creature in creatures:
+            if creature.danger_level <= self.danger_level:
+                creature_list.append(creature)
         return creature_list
 
-    def finalize(self, level_key):
+    def finalize(self, level_key, seed=None):
+        if seed is not None:
+            self.set_seed(seed)
+
         if self.generation_type.is_used():
             generate_tiles_to(self)
 
@@ -76,7 +150,7 @@ class Level(object):
             self.creature_spawn_list = self.get_creature_spawn_list()
 
             for _ in range(self.creature_spawn_count):
-                creature = random.choice(self.creature_spawn_list).copy()
+                creature = self.spawn_random.choice(self.creature_spawn_list).copy()
                 self.spawn_creature(creature)
         else:
             self.creature_spawn_list = []
@@ -91,13 +165,13 @@ class Level(object):
 
     def free_coord(self):
         for _ in range(Debug.max_loop_cycles):
-            coord = self.tiles.random_coord()
+            coord = self.tiles.random_coord(self.spawn_random)
             if self.is_passable(coord):
                 return coord
 
         free_coords = [coord for coord in self.tiles.coord_iter() if self.is_passable(coord)]
         if free_coords:
-            return random.choice(free_coords)
+            return self.spawn_random.choice(free_coords)
         else:
             assert False, "Free coord search failed."
 
@@ -130,15 +204,29 @@ class Level(object):
             last = coord
 
     def get_neighbor_location_coords_and_costs(self, coord):
-        for direction in self.get_passable_neighbors(coord):
-            neighbor_coord = add_vector(coord, direction)
-            multiplier = self.movement_multiplier(coord, direction)
-            yield neighbor_coord, round(multiplier * Action.Move.base_cost)
+        y, x = coord
+        rows, cols = self.tiles.dimensions
+        passable = self.tiles.passable
+        move_mult = self.tiles.move_mult
+        origin_index = y * cols + x
+        origin_multiplier = move_mult[origin_index]
+        base_cost = Action.Move.base_cost
+        for (dy, dx), direction_multiplier in _neighbor_move_mults:
+            ny, nx = y + dy, x + dx
+            if 0 <= ny < rows and 0 <= nx < cols:
+                index = ny * cols + nx
+                if passable[index]:
+                    tile_multiplier = (origin_multiplier + move_mult[index]) / 2
+                    yield (ny, nx), round(tile_multiplier * direction_multiplier * base_cost)
 
     def get_passable_neighbors(self, coord):
+        y, x = coord
+        rows, cols = self.tiles.dimensions
+        passable = self.tiles.passable
         for direction in Dir.All:
-            neighbor_coord = add_vector(coord, direction)
-            if self.is_legal(neighbor_coord) and self.tiles[neighbor_coord].is_passable:
+            dy, dx = direction
+            ny, nx = y + dy, x + dx
+            if 0 <= ny < rows and 0 <= nx < cols and passable[ny * cols + nx]:
                 yield direction
 
     @wraps(Array2D.is_legal, assigned=())
@@ -149,13 +237,97 @@ class Level(object):
         if coord in self.creatures:
             return False
         else:
-            return self.tiles[coord].is_passable
+            return self.tiles.passable[self.tiles.get_index(coord)]
 
     def is_pathable(self, coord):
-        return self.tiles[coord].is_passable
+        return self.tiles.passable[self.tiles.get_index(coord)]
 
     def is_see_through(self, coord):
-        return self.tiles[coord].is_see_through
+        return self.tiles.see_through[self.tiles.get_index(coord)]
+
+    @timed("fov.light_set")
+    def get_light_set(self, coord, sight):
+        """
+        Return a frozenset of the coords visible from coord with the given sight.
+
+        Results are cached per (coord, sight) so creatures standing still or
+        sharing a sight radius don't recompute their field of view. The cache is
+        dropped whenever the transparency of a tile changes.
+        """
+        return self._get_cached_coord_set(self._light_set_cache, self._compute_light_set, coord, sight)
+
+    @timed("fov.los_set")
+    def get_los_set(self, coord, sight):
+        """
+        Return a frozenset of the coords within sight distance that have check_los to coord.
+
+        check_los is symmetric so this answers "can a creature at X see coord" for
+        every X at once. Cached like get_light_set.
+        """
+        return self._get_cached_coord_set(self._los_set_cache, self._compute_los_set, coord, sight)
+
+    def get_light_bitmap(self, coord, sight):
+        """
+        Return a CoordBitmap of the coords of get_light_set.
+
+        Remembered squares are updated from it with a bitwise OR. Cached like
+        get_light_set, the bitmap mustn't be modified. Fov algorithms with a
+        light mask compute it directly, the others build it from the light set.
+        """
+        return self._get_cached_coord_set(self._light_bitmap_cache, self._compute_light_bitmap, coord, sight,
+                                          self.light_bitmap_cache_size)
+
+    def _get_cached_coord_set(self, cache, compute, coord, sight, cache_size=None):
+        if self._vision_cache_revision != self.tiles.see_through_revision:
+            self._light_set_cache.clear()
+            self._los_set_cache.clear()
+            self._light_bitmap_cache.clear()
+            self._vision_cache_revision = self.tiles.see_through_revision
+
+        key = coord, sight
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        count("fov.cache_miss")
+        coord_set = compute(coord, sight)
+        cache[key] = coord_set
+        if len(cache) > (cache_size or self.vision_cache_size):
+            cache.popitem(last=False)
+        return coord_set
+
+    def _compute_light_set(self, coord, sight):
+        rows, cols = self.tiles.dimensions
+        algorithm = fov.algorithms[GameConf.fov_algorithm]
+        if hasattr(algorithm, "get_light_mask"):
+            # The mask is kept as the light bitmap so the fov of the player isn't computed twice
+            mask = self.get_light_bitmap(coord, sight).data
+            return frozenset(algorithm.get_light_set_from_mask(mask, coord, sight, rows, cols))
+        return frozenset(algorithm.get_light_set_from_plane(self.tiles.see_through, coord, sight, rows, cols))
+
+    def _compute_light_bitmap(self, coord, sight):
+        dimensions = self.tiles.dimensions
+        algorithm = fov.algorithms[GameConf.fov_algorithm]
+        if hasattr(algorithm, "get_light_mask"):
+            return CoordBitmap.from_mask(dimensions, algorithm.get_light_mask(self.tiles.see_through, coord,
+                                                                              sight, *dimensions))
+        return CoordBitmap(dimensions, self.get_light_set(coord, sight))
+
+    def _compute_los_set(self, coord, sight):
+        origin_y, origin_x = coord
+        rows, cols = self.tiles.dimensions
+        see_through = self.tiles.see_through
+        sight_squared = sight * sight
+        los_set = set()
+        for y in range(max(origin_y - sight, 0), min(origin_y + sight + 1, rows)):
+            for x in range(max(origin_x - sight, 0), min(origin_x + sight + 1, cols)):
+                if (origin_y - y) ** 2 + (origin_x - x) ** 2 > sight_squared:
+                    continue
+                target = y, x
+                if (all(see_through[ly * cols + lx] for ly, lx in bresenham(coord, target)) or
+                        all(see_through[ly * cols + lx] for ly, lx in bresenham(target, coord))):
+                    los_set.add(target)
+        return frozenset(los_set)
 
     def check_los(self, coordA, coordB):
         return not (any(not self.is_see_through(coord) for coord in bresenham(coordA, coordB)) and
@@ -165,9 +337,10 @@ class Level(object):
         return round(path.heuristic(coordA, coordB, Action.Move.base_cost, Dir.DiagonalMoveMult))
 
     def movement_multiplier(self, coord, direction):
-        origin_multiplier = self.tiles[coord].movement_multiplier
+        move_mult = self.tiles.move_mult
+        origin_multiplier = move_mult[self.tiles.get_index(coord)]
         target_coord = add_vector(coord, direction)
-        target_multiplier = self.tiles[target_coord].movement_multiplier
+        target_multiplier = move_mult[self.tiles.get_index(target_coord)]
 
         tile_multiplier = (origin_multiplier + target_multiplier) / 2
         return tile_multiplier * Dir.move_mult(direction)
@@ -179,8 +352,47 @@ class Level(object):
             cost += cross_product(start_coord, end_coord, nudge_coord) / Debug.cross_mod
         return cost
 
+    @timed("path.distance_map")
+    def get_distance_map(self, goal_coord):
+        """
+        Return a dict of the movement cost from every coord that can reach goal_coord.
+
+        The map is computed over tiles only, creatures are left for the callers
+        to step around since they move every turn. Maps are cached per goal and
+        dropped when the passability or movement multiplier of a tile changes.
+        """
+        cache = self._distance_map_cache
+        if self._distance_map_cache_revision != self.tiles.movement_revision:
+            cache.clear()
+            self._distance_map_cache_revision = self.tiles.movement_revision
+
+        if goal_coord in cache:
+            cache.move_to_end(goal_coord)
+            return cache[goal_coord]
+
+        count("path.distance_map_miss")
+        distance_map = path.dijkstra_map(goal_coord, self.get_neighbor_location_coords_and_costs)
+        cache[goal_coord] = distance_map
+        if len(cache) > self.distance_map_cache_size:
+            cache.popitem(last=False)
+        return distance_map
+
+    @timed("path.search")
     def path(self, start_coord, goal_coord):
-        return path.path(start_coord, goal_coord, self.get_neighbor_location_coords_and_costs, self._a_star_heuristic)
+        """
+        Return a list of the coords of a path from start_coord to goal_coord.
+
+        Paths between clusters are searched hierarchically on the cluster graph
+        of the level, see hpa. Raise path.PathException if there is no path.
+        """
+        if self.cluster_graph is None:
+            self._init_cluster_graph()
+        return self.cluster_graph.path(start_coord, goal_coord)
+
+    @timed("path.cluster_graph")
+    def _init_cluster_graph(self):
+        self.cluster_graph = ClusterGraph(self)
+        self.tiles.movement_change.subscribe(self.cluster_graph.mark_dirty)
 
     def look_information(self, coord):
         #if coord in creature.visited_location_coords:
@@ -223,6 +435,7 @@ class Level(object):
             blocking_creature = self.creatures[coord]
             self.move_creature(blocking_creature, self.free_coord())
         self.creatures[coord] = creature
+        self.creature_index.add(coord)
         creature.coord = coord
         creature.level = self
         self.visible_change.trigger(coord)
@@ -230,6 +443,7 @@ class Level(object):
     def remove_creature(self, creature):
         coord = creature.coord
         del self.creatures[coord]
+        self.creature_index.discard(coord)
         creature.coord = None
         creature.level = None
         self.turn_scheduler.remove(creature)
@@ -239,6 +453,7 @@ class Level(object):
         old_coord = creature.coord
         del self.creatures[old_coord]
         self.creatures[new_coord] = creature
+        self.creature_index.move(old_coord, new_coord)
         creature.coord = new_coord
 
         self.visible_change.trigger(old_coord)
@@ -249,12 +464,43 @@ class Level(object):
         self.move_creature(creature, target_coord)
 
     def swap_creature(self, creatureA, creatureB):
+        # The occupied coords stay the same so creature_index doesn't change
         creatureA.coord, creatureB.coord = creatureB.coord, creatureA.coord
         self.creatures[creatureA.coord] = creatureA
         self.creatures[creatureB.coord] = creatureB
         self.visible_change.trigger(creatureA.coord)
         self.visible_change.trigger(creatureB.coord)
 
+    def get_creatures_in_radius(self, coord, radius):
+        """Return a list of the creatures within radius of coord."""
+        creatures = self.creatures
+        return [creatures[creature_coord] for creature_coord in self.creature_index.in_radius(coord, radius)]
+
+    def get_creature_coords_in_vision(self, coord, sight, vision):
+        """
+        Return a set of the coords of the creatures in vision.
+
+        vision is the light set of coord and sight, so only the creatures within
+        the sight radius are checked.
+        """
+        return {creature_coord for creature_coord in self.creature_index.in_radius(coord, sight)
+                if creature_coord in vision}
+
+    def get_creatures_in_rectangle(self, rectangle):
+        """Return a list of the creatures in rectangle, a (y_start, x_start, y_limit, x_limit) tuple."""
+        creatures = self.creatures
+        return [creatures[creature_coord] for creature_coord in self.creature_index.in_rectangle(rectangle)]
+
+    def get_nearest_creature(self, coord, max_radius=None, exclude=()):
+        """Return the creature closest to coord that isn't in exclude or None if there isn't one."""
+        exclude_coords = {creature.coord for creature in exclude}
+        nearest_coord = self.creature_index.nearest(coord, max_radius, exclude_coords)
+        return None if nearest_coord is None else self.creatures[nearest_coord]
+
+    def get_item_coords_in_radius(self, coord, radius):
+        """Return a list of the coords with items within radius of coord."""
+        return list(self.item_index.in_radius(coord, radius))
+
     def view_items(self, coord):
         if coord in self.items:
             return tuple(self.items[coord])
@@ -277,6 +523,7 @@ class Level(object):
             self.items[coord] = left_items
         else:
             del self.items[coord]
+            self.item_index.discard(coord)
 
         self.visible_change.trigger(coord)
         return taken_items
@@ -287,4 +534,5 @@ class Level(object):
         else:
             current_items = ()
         self.items[coord] = tuple(itertools.chain(current_items, items))
+        self.item_index.add(coord)
         self.visible_change.trigger(coord)
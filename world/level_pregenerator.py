@@ -0,0 +1,66 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+
+def finalize_level(level, level_key, seed):
+    """Finalize level with its random streams seeded by seed and return it."""
+    level.finalize(level_key, seed)
+    return level
+
+
+class LevelPregenerator(object):
+
+    """
+    Finalizes levels in a worker process ahead of the player needing them.
+
+    Unfinalized levels are pickled to the worker which returns the finalized
+    level. The caller adopts the returned level in place of the old one.
+    """
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max_workers
+        self.executor = None
+        self.pending = {}
+
+    def __contains__(self, level_key):
+        return level_key in self.pending
+
+    def submit(self, level_key, level, seed):
+        if level_key in self.pending:
+            return
+        try:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self.pending[level_key] = self.executor.submit(finalize_level, level, level_key, seed)
+        except (OSError, NotImplementedError) as e:
+            logging.warning("Level pregeneration unavailable: {}".format(e))
+
+    def result(self, level_key, level, seed):
+        """
+        Return the finalized level for level_key.
+
+        Blocks until the worker is done. If the worker failed the given level is
+        finalized here instead.
+        """
+        future = self.pending.pop(level_key)
+        try:
+            return future.result()
+        except Exception as e:
+            logging.warning("Level pregeneration of {} failed: {}".format(level_key, e))
+            return finalize_level(level, level_key, seed)
+
+    def shutdown(self):
+        """
+        Drop the pending levels and stop the workers without waiting for them.
+
+        Levels not started yet are cancelled, a level being finalized is left to
+        finish in the background.
+        """
+        if self.executor is not None:
+            # cancel_futures alone isn't enough, the executor cancels them only if
+            # it's still referenced when its management thread wakes up
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,157 @@
+import random
+from array import array
+
+from generic_structures import Array2D, Event, TypedGrid
+from world.tile import tile_registry
+
+
+class LevelTiles(object):
+
+    """
+    Two-dimensional grid of Tiles stored as a TypedGrid of tile registry ids.
+
+    Behaves like an Array2D of Tiles: tiles[coord] gets and sets Tile objects
+    while the grid itself only holds the small integer ids of tile_registry.
+
+    Flat property planes of the tiles are also maintained. They are indexed the
+    same way as the grid ie. with get_index(coord) and they are kept in sync on
+    every tile set from the property tables of the registry. They are the fast
+    read path for the hot queries of fov, pathing and level generation.
+
+    passable:    bytearray, 1 if the tile is passable
+    see_through: bytearray, 1 if the tile is see-through
+    move_mult:   array of doubles, the movement multiplier of the tile
+
+    see_through_revision is incremented whenever the transparency of a tile
+    changes and movement_revision whenever its passability or movement
+    multiplier changes so vision and distance caches can tell if they are stale.
+    movement_change is also triggered then with the (y_start, x_start, y_limit,
+    x_limit) rectangle of the changed tiles for caches invalidated by area.
+    """
+
+    def __init__(self, dimensions, init_values=(), fillvalue=None):
+        self.rows, self.cols = dimensions
+        get_id = tile_registry.get_id
+        self.ids = TypedGrid(dimensions, [get_id(tile) for tile in init_values], get_id(fillvalue))
+        self.see_through_revision = 0
+        self.movement_revision = 0
+        self.movement_change = Event()
+        self._build_planes()
+
+    def __getitem__(self, coord):
+        return tile_registry.tiles[self.ids[coord]]
+
+    def __setitem__(self, coord, tile):
+        index = self.get_index(coord)
+        tile_id = tile_registry.get_id(tile)
+        self.ids.data[index] = tile_id
+        self._set_planes(index, tile_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        tiles = tile_registry.tiles
+        return (tiles[tile_id] for tile_id in self.ids)
+
+    def __eq__(self, other):
+        if isinstance(other, (LevelTiles, Array2D)):
+            return self.dimensions == other.dimensions and list(self) == list(other)
+        return NotImplemented
+
+    def __getstate__(self):
+        # Saved as a byte grid of indexes into a palette of the tiles this level uses
+        # since registry ids depend on the order tiles were created in.
+        tile_ids = sorted(set(self.ids.data.tobytes()))
+        palette = [tile_registry.tiles[tile_id] for tile_id in tile_ids]
+        to_palette = bytearray(256)
+        for palette_index, tile_id in enumerate(tile_ids):
+            to_palette[tile_id] = palette_index
+        return self.dimensions, palette, self.ids.data.tobytes().translate(to_palette)
+
+    def __setstate__(self, state):
+        dimensions, palette, palette_grid = state
+        to_ids = bytearray(256)
+        for palette_index, tile in enumerate(palette):
+            to_ids[palette_index] = tile_registry.get_id(tile)
+        self.__init__(dimensions)
+        self.ids.data = array('B', palette_grid.translate(to_ids))
+        self._build_planes()
+
+    def get_coord(self, index):
+        return self.ids.get_coord(index)
+
+    def get_index(self, coord):
+        return self.ids.get_index(coord)
+
+    def is_legal(self, coord):
+        return self.ids.is_legal(coord)
+
+    def enumerate(self):
+        tiles = tile_registry.tiles
+        for coord, tile_id in self.ids.enumerate():
+            yield coord, tiles[tile_id]
+
+    def coord_iter(self):
+        return self.ids.coord_iter()
+
+    def random_coord(self, rng=random):
+        return self.ids.random_coord(rng)
+
+    def fill_rectangle(self, rectangle, tile):
+        """Set all the tiles in rectangle to tile."""
+        tile_id = tile_registry.get_id(tile)
+        self.ids.fill_rectangle(rectangle, tile_id)
+
+        y_start, x_start, y_limit, x_limit = rectangle
+        width = x_limit - x_start
+        if width <= 0:
+            return
+        passable_row = bytes([tile_registry.passable[tile_id]]) * width
+        see_through_row = bytes([tile_registry.see_through[tile_id]]) * width
+        move_mult_row = array('d', [tile_registry.move_mult[tile_id]]) * width
+        for y in range(y_start, y_limit):
+            start = y * self.cols + x_start
+            limit = start + width
+            if self.passable[start:limit] != passable_row or self.move_mult[start:limit] != move_mult_row:
+                self.passable[start:limit] = passable_row
+                self.move_mult[start:limit] = move_mult_row
+                self.movement_revision += 1
+                self.movement_change.trigger((y, x_start, y + 1, x_limit))
+            if self.see_through[start:limit] != see_through_row:
+                self.see_through[start:limit] = see_through_row
+                self.see_through_revision += 1
+
+    def rectangle_consists_of(self, rectangle, tile_seq):
+        """Return True if rectangle is inside the grid and has only tiles in tile_seq."""
+        return self.ids.rectangle_in_set(rectangle, (tile_registry.get_id(tile) for tile in tile_seq))
+
+    @property
+    def dimensions(self):
+        return self.rows, self.cols
+
+    def _build_planes(self):
+        id_bytes = self.ids.data.tobytes()
+        self.passable = bytearray(id_bytes.translate(_get_translation(tile_registry.passable)))
+        self.see_through = bytearray(id_bytes.translate(_get_translation(tile_registry.see_through)))
+        move_mult = tile_registry.move_mult
+        self.move_mult = array('d', [move_mult[tile_id] for tile_id in id_bytes])
+
+    def _set_planes(self, index, tile_id):
+        passable = tile_registry.passable[tile_id]
+        see_through = tile_registry.see_through[tile_id]
+        move_mult = tile_registry.move_mult[tile_id]
+        if self.passable[index] != passable or self.move_mult[index] != move_mult:
+            self.passable[index] = passable
+            self.move_mult[index] = move_mult
+            self.movement_revision += 1
+            y, x = divmod(index, self.cols)
+            self.movement_change.trigger((y, x, y + 1, x + 1))
+        if self.see_through[index] != see_through:
+            self.see_through[index] = see_through
+            self.see_through_revision += 1
+
+
+def _get_translation(id_table):
+    """Return a bytes.translate table for a registry property table."""
+    return bytes(id_table).ljust(256, b'\0')
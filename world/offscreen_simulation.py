@@ -0,0 +1,100 @@
+"""
+Keeps the levels out of sight moving at a reduced fidelity.
+
+Only the level of the player runs creature by creature through its turn
+scheduler. The other levels are advanced in coarse time buckets: in a bucket
+every creature takes one aggregated random walk standing for all the moves it
+would have made in that time, with no field of view or AI involved. The walk is
+a straight line to a normally distributed offset and it's dropped if anything
+blocks the line. So the cost
+of simulating a level scales with the number of buckets, not with the number
+of creature turns in them.
+
+Every level records the game time it has been simulated up to. A few buckets
+are stepped between player turns on the levels that are furthest behind and a
+level the player enters is caught up to the present at once. Levels out of
+sight for longer than max_catch_up_buckets skip the time past that, by then the
+creatures are scattered anyway.
+"""
+from math import sqrt
+
+from game_actions import Action
+from generic_algorithms import bresenham
+from instrumentation import count, timed
+
+
+class OffscreenSimulator(object):
+
+    # Game time covered by one bucket, ten moves at normal speed
+    bucket_time = 10 * Action.Move.base_cost
+    # Most buckets a level is behind the game time
+    max_catch_up_buckets = 50
+    # Variance of the per axis displacement of a random move of the AI. It moves
+    # to a random direction 80% of the time and 3/4 of the directions change an axis.
+    move_variance = 0.8 * 0.75
+
+    def __init__(self, buckets_per_turn=1):
+        self.buckets_per_turn = buckets_per_turn
+
+    @timed("world.offscreen_step")
+    def step(self, world, active_level, now):
+        """Simulate up to buckets_per_turn buckets of the loaded levels other than active_level."""
+        levels = [level for level in world.levels.loaded.values()
+                  if level.is_finalized and level is not active_level]
+        budget = self.buckets_per_turn
+        for level in sorted(levels, key=_simulated_time_key):
+            if budget <= 0:
+                break
+            budget -= self._simulate(level, now, budget)
+
+    @timed("world.offscreen_catch_up")
+    def catch_up(self, level, now):
+        """Simulate level up to the game time now, or as close as whole buckets get."""
+        self._simulate(level, now, self.max_catch_up_buckets)
+
+    def _simulate(self, level, now, bucket_limit):
+        if level.simulated_time is None:
+            # Levels start being simulated from when they are first seen
+            level.simulated_time = now
+            return 0
+
+        max_lag = self.max_catch_up_buckets * self.bucket_time
+        if now - level.simulated_time > max_lag:
+            level.simulated_time = now - max_lag
+
+        buckets = min((now - level.simulated_time) // self.bucket_time, bucket_limit)
+        for _ in range(buckets):
+            self._simulate_bucket(level)
+        level.simulated_time += buckets * self.bucket_time
+        count("world.offscreen_buckets", buckets)
+        return buckets
+
+    def _simulate_bucket(self, level):
+        rng = level.offscreen_random
+        rows, cols = level.tiles.dimensions
+        max_y, max_x = rows - 1, cols - 1
+        for creature in list(level.creatures.values()):
+            moves = self.bucket_time / creature.action_cost(Action.Move)
+            deviation = sqrt(self.move_variance * moves)
+            y, x = creature.coord
+            target = (min(max(y + round(rng.gauss(0, deviation)), 0), max_y),
+                      min(max(x + round(rng.gauss(0, deviation)), 0), max_x))
+            # Walks blocked on the way are dropped instead of cut short, stopping at
+            # the obstacle would gather the creatures next to the walls
+            coord = _get_walk_end(level, creature.coord, target)
+            if coord == target and level.is_passable(coord):
+                level.move_creature(creature, coord)
+
+
+def _get_walk_end(level, start_coord, target_coord):
+    """Return the last pathable coord on the line from start_coord towards target_coord."""
+    end_coord = start_coord
+    for coord in bresenham(start_coord, target_coord):
+        if not level.is_pathable(coord):
+            break
+        end_coord = coord
+    return end_coord
+
+
+def _simulated_time_key(level):
+    return level.simulated_time if level.simulated_time is not None else float("inf")
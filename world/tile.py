@@ -1,8 +1,62 @@
+from array import array
+
+
+class TileRegistry(object):
+
+    """
+    Flyweight registry giving every distinct Tile a small integer id.
+
+    Id 0 is reserved for a missing tile (None). The property tables are indexed by
+    tile id so the properties of an id grid can be looked up without touching the
+    Tile objects.
+    """
+
+    max_tiles = 256
+
+    def __init__(self):
+        self.tiles = [None]
+        self._interned = {}
+        self.passable = bytearray([False])
+        self.see_through = bytearray([False])
+        self.move_mult = array('d', [1])
+
+    def get_interned(self, key):
+        return self._interned.get(key)
+
+    def register(self, tile, key, passable, see_through, move_mult):
+        assert len(self.tiles) < self.max_tiles, "Tile registry is full."
+        tile.id = len(self.tiles)
+        self.tiles.append(tile)
+        self._interned[key] = tile
+        self.passable.append(passable)
+        self.see_through.append(see_through)
+        self.move_mult.append(move_mult)
+
+    def get_id(self, tile):
+        return 0 if tile is None else tile.id
+
+
+tile_registry = TileRegistry()
 
 
 class Tile(object):
 
-    """Permanent portion of a square. Eg. walls or floor."""
+    """
+    Permanent portion of a square. Eg. walls or floor.
+
+    Tiles are interned in tile_registry: creating a Tile with the same
+    definition as an existing one returns the existing object. Tiles are pickled
+    by definition so loading a save gives back the same interned objects. The
+    registry tables are filled at creation so tiles shouldn't be modified after.
+    """
+
+    def __new__(cls, name, visible_char, mem_char, passable=True, see_through=True, move_mult=1):
+        key = name, visible_char, mem_char, passable, see_through, move_mult
+        tile = tile_registry.get_interned(key)
+        if tile is None:
+            tile = super().__new__(cls)
+            tile_registry.register(tile, key, passable, see_through, move_mult)
+        return tile
 
     def __init__(self, name, visible_char, mem_char, passable=True, see_through=True, move_mult=1):
         self.name = name
@@ -12,6 +66,10 @@ class Tile(object):
         self.is_see_through = see_through
         self.movement_multiplier = move_mult
 
+    def __reduce__(self):
+        return Tile, (self.name, self.visible_char, self.memory_char, self.is_passable,
+                      self.is_see_through, self.movement_multiplier)
+
     @property
     def defense(self):
         return 0
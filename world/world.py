@@ -1,7 +1,10 @@
 from collections import Counter, namedtuple
+from collections.abc import MutableMapping
 
 from enums.level_location import LevelLocation
 from world.level import Level
+from rng import derive_seed, new_seed
+from world.level_pregenerator import finalize_level
 
 
 class LevelNotFound(Exception): pass
@@ -11,14 +14,77 @@ LevelKey = namedtuple("LevelKey", ("dungeon, index"))
 WorldPoint = namedtuple("WorldPoint", ("level_key, level_location"))
 
 
+class LevelMapping(MutableMapping):
+
+    """
+    Dict of levels by level key which can load levels on first access.
+
+    Keys in unloaded are known to exist but their levels are only read with
+    source.load_level(level_key) when they are first asked for. Used by
+    state_store so a loaded game only decompresses the levels that are actually
+    visited.
+    """
+
+    def __init__(self, levels=(), unloaded=(), source=None):
+        self.loaded = dict(levels)
+        self.unloaded = set(unloaded)
+        self.source = source
+
+    def __getitem__(self, level_key):
+        if level_key in self.unloaded:
+            self.loaded[level_key] = self.source.load_level(level_key)
+            self.unloaded.discard(level_key)
+        return self.loaded[level_key]
+
+    def __setitem__(self, level_key, level):
+        self.unloaded.discard(level_key)
+        self.loaded[level_key] = level
+
+    def __delitem__(self, level_key):
+        if level_key in self.unloaded:
+            self.unloaded.discard(level_key)
+        else:
+            del self.loaded[level_key]
+
+    def __contains__(self, level_key):
+        return level_key in self.loaded or level_key in self.unloaded
+
+    def __iter__(self):
+        yield from self.loaded
+        yield from self.unloaded
+
+    def __len__(self):
+        return len(self.loaded) + len(self.unloaded)
+
+    def __reduce__(self):
+        # The state is set after the mapping is created so the source can refer back to it
+        return LevelMapping, (), (self.loaded, self.unloaded, self.source)
+
+    def __setstate__(self, state):
+        self.loaded, self.unloaded, self.source = state
+
+
 class World(object):
 
-    def __init__(self, player):
-        self.levels = {}
+    def __init__(self, player, seed=None):
+        self.levels = LevelMapping()
         self.level_connections = {}
         self.dungeon_lengths = Counter()
         self.player = player
         self.start_level_key = None
+        if seed is None:
+            seed = new_seed()
+        self.seed = seed
+        self.level_pregenerator = None
+
+    def __getstate__(self):
+        state = vars(self).copy()
+        del state['level_pregenerator']
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self.level_pregenerator = None
 
     def add_level(self, dungeon_key, level=None):
         self.dungeon_lengths[dungeon_key] += 1
@@ -44,9 +110,32 @@ class World(object):
 
         level = self.levels[level_key]
         if not level.is_finalized:
-            level.finalize(level_key)
+            seed = self.get_level_seed(level_key)
+            if self.level_pregenerator is not None and level_key in self.level_pregenerator:
+                level = self.level_pregenerator.result(level_key, level, seed)
+            else:
+                level = finalize_level(level, level_key, seed)
+            self.levels[level_key] = level
         return level
 
+    def get_dungeon_seed(self, dungeon_key):
+        return derive_seed(self.seed, dungeon_key)
+
+    def get_level_seed(self, level_key):
+        """Return the seed of a level which only depends on the world seed and level_key."""
+        return derive_seed(self.get_dungeon_seed(level_key.dungeon), level_key.index)
+
+    def pregenerate_adjacent_levels(self, level_key):
+        """Start finalizing the previous and next levels of the dungeon in the background."""
+        if self.level_pregenerator is None:
+            return
+
+        dungeon, index = level_key
+        for adjacent_key in (LevelKey(dungeon, index - 1), LevelKey(dungeon, index + 1)):
+            if adjacent_key in self.levels and not self.levels[adjacent_key].is_finalized:
+                self.level_pregenerator.submit(adjacent_key, self.levels[adjacent_key],
+                                               self.get_level_seed(adjacent_key))
+
     def has_destination(self, world_point):
         return world_point in self.level_connections
 